@@ -0,0 +1,175 @@
+"""
+Benchmarks of the game loop, played offline with MockChatCompletionClient.
+
+Measures the wall time per card and the number of LLM calls per try of the three chats and of a whole game,
+and the time spent by Spacy and by the Levenshtein check for each hint. Run it from the repository folder:
+
+    python -m benchmarks.benchmark --cards 50 --latency 0.01 --output bench.json
+
+With --baseline, the results are compared with a previous output and the script exits with an error
+if any time grows more than --tolerance or if the number of LLM calls per try grows.
+"""
+import argparse
+import asyncio
+import contextlib
+import csv
+import io
+import itertools
+import json
+import random
+import statistics
+import sys
+import time
+from src import Game, MockChatCompletionClient, ModelClientPool
+from src.chats import CpuChat, PlayerGuessChat, PlayerHintChat
+from src.evaluate_hint import ForbiddenMatcher, evaluate_hints, extract_main_words, lev_within, normalize_word
+from src.mock_client import MOCK_VOCABULARY
+
+def load_cards(cards_path : str, n_cards : int, seed : int) -> list:
+    """
+    Samples cards from the cards csv file, as (target_word, forbidden) pairs.
+    """
+    with open(cards_path, encoding='utf-8', newline='') as f:
+        rows = list(csv.DictReader(f))
+    rows = random.Random(seed).sample(rows, min(n_cards, len(rows)))
+    return [(row['target'], [row[f'forbidden_{i}'] for i in range(1, 6)]) for row in rows]
+
+def build_hints(cards : list, seed : int) -> list:
+    """
+    Builds a hint for each card, mixing vocabulary words with some words of other cards.
+    """
+    rng = random.Random(seed)
+    words = [word for _, forbidden in cards for word in forbidden]
+    return [f'Es {rng.choice(MOCK_VOCABULARY)} y se usa con {rng.choice(words).lower()} en la {rng.choice(MOCK_VOCABULARY)}'
+            for _ in cards]
+
+def scripted_input(responses : list):
+    """
+    Returns an input function that answers with the given responses, cyclically.
+    """
+    responses = itertools.cycle(responses)
+    return lambda prompt = '' : next(responses)
+
+def mock_pool(latency : float, seed : int) -> ModelClientPool:
+    return ModelClientPool(client_factory=lambda model, temperature : MockChatCompletionClient(seed=seed, latency=latency))
+
+def llm_calls(model_clients : ModelClientPool) -> int:
+    return sum(client.calls for client in model_clients.clients.values())
+
+def percentile(values : list, q : float) -> float:
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+def bench_hint_checks(cards : list, hints : list) -> dict:
+    """
+    Measures the time per hint of the Spacy filtering, one by one and in batch, and of the Levenshtein check.
+    """
+    extract_main_words(hints[0])
+    start = time.perf_counter()
+    main_words = [extract_main_words(hint) for hint in hints]
+    spacy_time = (time.perf_counter() - start) / len(hints)
+    start = time.perf_counter()
+    list(evaluate_hints((forbidden + [target_word], hint) for (target_word, forbidden), hint in zip(cards, hints)))
+    batch_time = (time.perf_counter() - start) / len(hints)
+    matchers = [ForbiddenMatcher.from_card(target_word, forbidden) for target_word, forbidden in cards]
+    words = [[normalize_word(word) for word in hint_words] for hint_words in main_words]
+    start = time.perf_counter()
+    for matcher, hint_words in zip(matchers, words):
+        for word in hint_words:
+            for token in matcher.tokens:
+                lev_within(token, word, 1)
+    lev_time = (time.perf_counter() - start) / len(hints)
+    return {'spacy_ms_per_hint' : spacy_time * 1e3, 'spacy_batch_ms_per_hint' : batch_time * 1e3,
+            'levenshtein_ms_per_hint' : lev_time * 1e3}
+
+async def bench_chat(chat_class, cards : list, latency : float, seed : int, **kwargs) -> dict:
+    """
+    Plays the cards with a chat and measures the wall time per card and the number of LLM calls per try.
+    """
+    model_clients = mock_pool(latency, seed)
+    chat = None
+    card_times, total_tries = [], 0
+    for target_word, forbidden in cards:
+        start = time.perf_counter()
+        if chat is None:
+            chat = chat_class(model_clients, 'gpt-4o-mini', forbidden, target_word, **kwargs)
+        else:
+            await chat.set_card(forbidden, target_word)
+        _, tries = await chat.initiate_round()
+        card_times.append(time.perf_counter() - start)
+        total_tries += min(tries, 10)
+    calls = llm_calls(model_clients)
+    await model_clients.close()
+    return {'card_ms_mean' : statistics.mean(card_times) * 1e3, 'card_ms_p95' : percentile(card_times, 0.95) * 1e3,
+            'llm_calls_per_try' : calls / max(total_tries, 1)}
+
+async def bench_game(cards_path : str, latency : float, seed : int) -> dict:
+    """
+    Plays a whole game (1 round, 2 cards per turn) with scripted player answers and measures its wall time.
+    """
+    random.seed(seed)
+    model_clients = mock_pool(latency, seed)
+    game = Game(cards_path, 'gpt-4o-mini', rounds=1, cards_per_turn=2, model_clients=model_clients,
+                input_func=scripted_input(MOCK_VOCABULARY), seed=seed)
+    start = time.perf_counter()
+    await game.start_game()
+    return {'game_ms' : (time.perf_counter() - start) * 1e3}
+
+async def run_benchmarks(args) -> dict:
+    cards = load_cards(args.cards_path, args.cards, args.seed)
+    hints = build_hints(cards, args.seed)
+    results = {'hint_checks' : bench_hint_checks(cards, hints)}
+    player_input = scripted_input(MOCK_VOCABULARY)
+    # The messages of the game are not printed while the loops are measured
+    with contextlib.redirect_stdout(io.StringIO()):
+        results['cpu_chat'] = await bench_chat(CpuChat, cards, args.latency, args.seed, verbose=False)
+        results['cpu_chat_pipelined'] = await bench_chat(CpuChat, cards, args.latency, args.seed, verbose=False, pipelined=True)
+        results['player_hint_chat'] = await bench_chat(PlayerHintChat, cards, args.latency, args.seed, input_func=player_input)
+        results['player_guess_chat'] = await bench_chat(PlayerGuessChat, cards, args.latency, args.seed, input_func=player_input)
+        results['game'] = await bench_game(args.cards_path, args.latency, args.seed)
+    return results
+
+def compare(results : dict, baseline : dict, tolerance : float) -> list:
+    """
+    Compares the results with a baseline.
+
+    Returns (list): The descriptions of the regressions found.
+    """
+    regressions = []
+    for section, metrics in baseline.items():
+        for metric, old in metrics.items():
+            new = results.get(section, {}).get(metric)
+            if new is None:
+                continue
+            limit = old if metric == 'llm_calls_per_try' else old * (1 + tolerance)
+            if new > limit + 1e-9:
+                regressions.append(f'{section}.{metric}: {old:.3f} -> {new:.3f}')
+    return regressions
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Offline benchmarks of the game loop")
+    parser.add_argument("-p", "--cards_path", type=str, help="Path for cards.csv file", default="data/cards.csv")
+    parser.add_argument("-n", "--cards", type=int, help="Number of cards played by each chat", default=30)
+    parser.add_argument("-l", "--latency", type=float, help="Mean simulated latency of the model calls, in seconds", default=0.0)
+    parser.add_argument("-s", "--seed", type=int, help="Seed for the cards, hints and mock responses", default=0)
+    parser.add_argument("-o", "--output", type=str, help="Path of a json file to save the results", default=None)
+    parser.add_argument("-b", "--baseline", type=str, help="Path of a previous json output to compare with", default=None)
+    parser.add_argument("-t", "--tolerance", type=float, help="Allowed relative growth of the times", default=0.2)
+    args = parser.parse_args()
+
+    results = asyncio.run(run_benchmarks(args))
+    for section, metrics in results.items():
+        print(f'{section} : ' + ', '.join(f'{metric} = {value:.3f}' for metric, value in metrics.items()))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,7 +1,8 @@
 import argparse
 import asyncio
 from dotenv import load_dotenv
-from src import Game
+# The classes of src are imported when they are first used, so only the modules needed by the command are loaded
+import src
 
 # Load environment variables from .env
 load_dotenv()
@@ -12,12 +13,156 @@ parser.add_argument("-p", "--cards_path", type=str, help="Path for cards.csv fil
 parser.add_argument("-m", "--model", type=str, help="OpenAI model to use", default="gpt-4o-mini")
 parser.add_argument("-r", "--rounds", type=int, help="Number of rounds (each round consists of 4 turns: 2 by the player and 2 by the CPU)", default=2)
 parser.add_argument("-c", "--cards_per_turn", type=int, help="Number of cards per turn", default=5)
+parser.add_argument("-v", "--hint_validation", type=str, choices=["local", "llm"], help="Validate hints in process (local) or with the HintEvaluator agent (llm)", default="local")
+parser.add_argument("-t", "--tokenizer", type=str, choices=["spacy", "rules"], help="Extract the main words of the hints with Spacy or with a list of Spanish function words (rules), which doesn't load Spacy", default="spacy")
+parser.add_argument("--pipelined", action="store_true", help="Overlap the agents of the CPU turns: generate the guess while the hint is validated and the next hint while the guess is evaluated")
+parser.add_argument("--stream", action="store_true", help="Print the AI hints as they are generated, aborting and regenerating the ones that use forbidden words")
+parser.add_argument("--memory", type=str, choices=["full", "window", "summary"], help="What the AI remembers of the previous tries of a card: the whole conversation (full), the last 3 tries (window) or a summary of the previous hints and guesses (summary)", default="full")
+parser.add_argument("--hint_bank", type=str, help="Path of a hint bank built with the hints command. The AI gives its hints before generating new ones", default=None)
+parser.add_argument("--trace", type=str, help="Path of a JSONL file to save the time and tokens of every agent call, player input and hint check", default=None)
+parser.add_argument("--mock", action="store_true", help="Use a local mock instead of the OpenAI API (no network needed)")
+parser.add_argument("--mock_latency", type=float, help="Mean simulated latency of the mock model calls, in seconds", default=0.0)
+parser.add_argument("--mock_error_rate", type=float, help="Fraction of the mock model calls rejected with a rate limit error (429)", default=0.0)
+parser.add_argument("--rpm", type=int, help="Maximum model requests per minute of the whole process", default=None)
+parser.add_argument("--tpm", type=int, help="Maximum model tokens per minute of the whole process", default=None)
+parser.add_argument("--max_retries", type=int, help="Maximum retries of a model request rejected for rate limits", default=5)
+parser.add_argument("--cache", type=str, help="Path of a SQLite file to cache the responses of the evaluator agents (temperature 0)", default=None)
+parser.add_argument("--cache_size", type=int, help="Maximum number of responses kept in the cache", default=10000)
+subparsers = parser.add_subparsers(dest="command")
+simulate_parser = subparsers.add_parser("simulate", help="Play CPU rounds over the deck concurrently, without a human player")
+simulate_parser.add_argument("-n", "--n_cards", type=int, help="Number of cards sampled from the deck (all the cards by default)", default=None)
+simulate_parser.add_argument("--repeats", type=int, help="Number of times each sampled card is played", default=1)
+simulate_parser.add_argument("-j", "--concurrency", type=int, help="Maximum number of rounds played at the same time", default=8)
+simulate_parser.add_argument("-s", "--seed", type=int, help="Seed for the card sampling", default=None)
+simulate_parser.add_argument("--batch_window", type=float, help="Evaluate the ambiguous guesses of the concurrent rounds together in one request, waiting this many seconds for them (one by one by default)", default=None)
+simulate_parser.add_argument("-o", "--output", type=str, help="Path of a csv file to save the result of each card", default=None)
+simulate_parser.add_argument("--cards_output", type=str, help="Path of a csv file to save the plays, hits and success rate of each card", default=None)
+compare_parser = subparsers.add_parser("compare", help="Play the same sample of cards with several models at the same time and compare their results, latency and tokens")
+compare_parser.add_argument("-M", "--models", type=str, nargs="+", required=True, help="Models to compare. MODEL:N limits the rounds of a model played at the same time to N")
+compare_parser.add_argument("-n", "--n_cards", type=int, help="Number of cards sampled from the deck (all the cards by default)", default=None)
+compare_parser.add_argument("--repeats", type=int, help="Number of times each sampled card is played by each model", default=1)
+compare_parser.add_argument("-j", "--concurrency", type=int, help="Maximum number of rounds of each model played at the same time", default=8)
+compare_parser.add_argument("-s", "--seed", type=int, help="Seed for the card sampling (random by default, the same for all the models)", default=None)
+compare_parser.add_argument("--price", type=str, nargs=3, action="append", metavar=("MODEL", "PROMPT", "COMPLETION"), help="Price of the prompt and completion tokens of a model, in USD per million tokens, to show the cost of the comparison", default=[])
+compare_parser.add_argument("-o", "--output", type=str, help="Path of a csv file to save the comparison table", default=None)
+compare_parser.add_argument("--json", type=str, help="Path of a JSON file to save the comparison table and the result of each card", default=None)
+compile_parser = subparsers.add_parser("compile", help="Compile the cards csv file into a binary store with the precomputed tokens and lemmas")
+compile_parser.add_argument("-o", "--output", type=str, help="Path of the compiled store (next to the cards csv file by default)", default=None)
+hints_parser = subparsers.add_parser("hints", help="Generate and validate hints for the cards in advance and save them in a hint bank")
+hints_parser.add_argument("-o", "--output", type=str, help="Path of the hint bank (gzipped JSON)", default="data/hints.json.gz")
+hints_parser.add_argument("--per_card", type=int, help="Number of valid hints kept for each card", default=5)
+hints_parser.add_argument("-n", "--n_cards", type=int, help="Number of cards included, from the first one (all the cards by default)", default=None)
+hints_parser.add_argument("-j", "--concurrency", type=int, help="Maximum number of cards generated at the same time", default=8)
+check_tokenizer_parser = subparsers.add_parser("check_tokenizer", help="Compare the rules tokenizer with Spacy on a corpus of hints")
+check_tokenizer_parser.add_argument("-i", "--input", type=str, help="Hint bank (.gz) or csv file with the columns ID and hint", default="data/hint_corpus.csv")
+serve_parser = subparsers.add_parser("serve", help="Host many games at the same time for players connected through TCP (one message per line)")
+serve_parser.add_argument("--host", type=str, help="Address the server listens on", default="127.0.0.1")
+serve_parser.add_argument("--port", type=int, help="Port the server listens on", default=8765)
 args = parser.parse_args()
 
-# Create game instance and start
-game = Game(cards_path = args.cards_path, model = args.model, rounds = args.rounds, cards_per_turn = args.cards_per_turn)
+# Model clients shared by the whole run
+client_factory = None
+if args.mock:
+    client_factory = lambda model, temperature : src.MockChatCompletionClient(seed = 0, latency = args.mock_latency,
+                                                                              error_rate = args.mock_error_rate)
+cache = src.ResponseCache(args.cache, args.cache_size) if args.cache else None
+scheduler = src.RequestScheduler(args.rpm, args.tpm, args.max_retries)
+model_clients = src.ModelClientPool(client_factory = client_factory, cache = cache, scheduler = scheduler)
+tracer = src.Tracer(args.trace) if args.trace else None
+src.set_tracer(tracer)
+hint_bank = src.HintBank.load(args.hint_bank) if args.hint_bank else None
+# The cards are always compiled with the Spacy lemmas
+if args.command not in ("compile", "check_tokenizer"):
+    src.set_tokenizer(args.tokenizer)
 
-chat_result = asyncio.run(game.start_game())
+if args.command == "compile":
+    # Compile the cards into a binary store
+    cards = src.CardStore.compile(args.cards_path, args.output)
+    print(f'{len(cards)} CARTAS COMPILADAS EN {args.output or src.CardStore.store_path(args.cards_path)}')
+elif args.command == "check_tokenizer":
+    # Compare the main words and the evaluation of the hints with both tokenizers
+    report = src.compare_tokenizers(src.load_hint_corpus(args.input, src.CardStore.load(args.cards_path)))
+    for hint, spacy_words, rule_words in report['differences']:
+        print(f'{hint}\n  SPACY : {" ".join(spacy_words)}\n  REGLAS : {" ".join(rule_words)}')
+    print(f'PISTAS : {report["hints"]}')
+    print(f'MISMAS PALABRAS : {report["same_words"] / max(report["hints"], 1):.1%}')
+    print(f'MISMA EVALUACIÓN : {report["same_evaluation"] / max(report["hints"], 1):.1%}')
+elif args.command == "hints":
+    # Build the hint bank of the cards
+    bank = asyncio.run(src.HintBank.build(src.CardStore.load(args.cards_path), args.model, model_clients, args.per_card,
+                                          args.concurrency, args.n_cards))
+    bank.save(args.output)
+    print(f'PISTAS DE {len(bank)} CARTAS GUARDADAS EN {args.output}')
+elif args.command == "serve":
+    # Host a game for every connection, sharing the model clients and the cards
+    server = src.GameServer(cards_path = args.cards_path, model = args.model, rounds = args.rounds, cards_per_turn = args.cards_per_turn,
+                            host = args.host, port = args.port, model_clients = model_clients, hint_validation = args.hint_validation,
+                            pipelined = args.pipelined, streaming = args.stream, memory = args.memory,
+                            hint_bank = hint_bank)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        print('SERVIDOR DETENIDO')
+elif args.command == "compare":
+    # Split the concurrency limits of the models (MODEL:N)
+    models, model_concurrency = [], {}
+    for model in args.models:
+        # The model IDs can contain colons (fine-tuned models), so only a numeric suffix is a limit
+        name, _, limit = model.rpartition(':')
+        if name and limit.isdigit():
+            model = name
+            model_concurrency[model] = int(limit)
+        models.append(model)
+    prices = {model : (float(prompt_price), float(completion_price)) for model, prompt_price, completion_price in args.price}
 
-# Print results of the game
-print(chat_result)
\ No newline at end of file
+    # Create comparison instance and run
+    comparison = src.ModelComparison(cards_path = args.cards_path, models = models, n_cards = args.n_cards, repeats = args.repeats,
+                                     concurrency = args.concurrency, model_concurrency = model_concurrency, seed = args.seed,
+                                     client_factory = client_factory, cache = cache, scheduler = scheduler, prices = prices,
+                                     hint_validation = args.hint_validation, pipelined = args.pipelined, streaming = args.stream,
+                                     memory = args.memory, hint_bank = hint_bank)
+    report = asyncio.run(comparison.run())
+
+    # Print and save results of the comparison
+    print(report.summary())
+    if args.output:
+        report.to_csv(args.output)
+    if args.json:
+        report.to_json(args.json)
+elif args.command == "simulate":
+    # Create simulation instance and run
+    simulation = src.Simulation(cards_path = args.cards_path, model = args.model, n_cards = args.n_cards, repeats = args.repeats,
+                                concurrency = args.concurrency, seed = args.seed, hint_validation = args.hint_validation,
+                                model_clients = model_clients, pipelined = args.pipelined, streaming = args.stream,
+                                memory = args.memory, hint_bank = hint_bank, batch_window = args.batch_window)
+    report = asyncio.run(simulation.run())
+
+    # Print and save results of the simulation
+    print(report.summary())
+    if simulation.guess_batcher is not None:
+        print(simulation.guess_batcher.stats())
+    if args.output:
+        report.to_csv(args.output)
+    if args.cards_output:
+        report.cards_to_csv(args.cards_output)
+else:
+    # Create game instance and start
+    game = src.Game(cards_path = args.cards_path, model = args.model, rounds = args.rounds, cards_per_turn = args.cards_per_turn,
+                    hint_validation = args.hint_validation, model_clients = model_clients, pipelined = args.pipelined,
+                    streaming = args.stream, memory = args.memory, hint_bank = hint_bank)
+
+    chat_result = asyncio.run(game.start_game())
+
+    # Print results of the game
+    print(chat_result)
+
+if scheduler.sent:
+    print(scheduler.stats())
+
+if cache is not None:
+    print(cache.stats())
+    cache.close()
+
+if tracer is not None:
+    print(tracer.summary())
+    tracer.close()
@@ -1 +1,35 @@
-from .game import Game
\ No newline at end of file
+import importlib
+
+# Public classes and functions of the package and the modules that define them.
+# The modules are imported on first access (PEP 562), so importing the package doesn't load autogen or Spacy
+_EXPORTS = {
+    'Game' : '.game',
+    'Simulation' : '.simulation',
+    'ModelComparison' : '.comparison',
+    'GameServer' : '.server',
+    'QueueInput' : '.console',
+    'ModelClientPool' : '.clients',
+    'MockChatCompletionClient' : '.mock_client',
+    'ResponseCache' : '.cache',
+    'CardStore' : '.deck',
+    'Deck' : '.deck',
+    'HintBank' : '.hint_bank',
+    'RequestScheduler' : '.scheduler',
+    'Tracer' : '.tracing',
+    'set_tokenizer' : '.evaluate_hint',
+    'compare_tokenizers' : '.evaluate_hint',
+    'load_hint_corpus' : '.hint_bank',
+    'set_tracer' : '.tracing',
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name : str):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__() -> list:
+    return sorted(list(globals()) + __all__)
@@ -1,7 +1,33 @@
-from autogen_agentchat.agents import AssistantAgent, UserProxyAgent
+from typing import TYPE_CHECKING
+from autogen_agentchat.agents import AssistantAgent, BaseChatAgent, UserProxyAgent
+from autogen_agentchat.base import Response
+from autogen_agentchat.messages import TextMessage
+from autogen_core import CancellationToken
+from autogen_core.model_context import ChatCompletionContext
+from autogen_core.models import SystemMessage
 from autogen_ext.models.openai import OpenAIChatCompletionClient
-from .evaluate_hint import evaluate_hint
+from .evaluate_guess import GuessMatcher
+from .evaluate_hint import ForbiddenMatcher, evaluate_hint
+
+if TYPE_CHECKING:
+    from .batching import GuessBatcher
     
+def replace_system_message(agent : AssistantAgent, content : str) -> None:
+    """
+    Replaces the system message of an agent, so it can be re-targeted to a new card without rebuilding it.
+
+    AssistantAgent has no public setter for its system message: it is kept in the private `_system_messages` list,
+    which is read on every request. The attribute is checked first (also under python -O), so a renamed attribute
+    in a new autogen version fails here instead of silently keeping the system message of the previous card.
+
+    Args:
+        agent (AssistantAgent): The agent.
+        content (str): The new system message.
+    """
+    if not hasattr(agent, '_system_messages'):
+        raise AttributeError('AssistantAgent no longer keeps its system message in _system_messages')
+    agent._system_messages = [SystemMessage(content=content)]
+
 class HintGenerator(AssistantAgent):
     """
     An agent responsible for generating hints in the Taboo game.
@@ -15,13 +41,35 @@ class HintGenerator(AssistantAgent):
         target_word (str): The word the player needs to guess.
         forbidden (list[str]): A list of forbidden words that cannot be used in the hints.
         model_client (OpenAIChatCompletionClient): The language model client used to generate responses.
+        stream (bool): Whether the hints are streamed, so on_messages_stream yields their chunks as they are generated.
+        model_context (ChatCompletionContext): The memory of the agent within a card. None to keep the whole conversation.
     """
-    def __init__(self, target_word : str, forbidden : list, model_client : OpenAIChatCompletionClient):
+    def __init__(self, target_word : str, forbidden : list, model_client : OpenAIChatCompletionClient, stream : bool = False,
+                 model_context : ChatCompletionContext = None):
         name = "Hint_Generator"
-        system_message = f"""Eres una parte del juego de tabú. Tu misión es dar pistas para adivinar la palabra: {target_word}, sin usar ninguna palabra ni
+        system_message = self.build_system_message(target_word, forbidden)
+        super().__init__(name=name, system_message=system_message, model_client=model_client, model_client_stream=stream,
+                         model_context=model_context)
+
+    @staticmethod
+    def build_system_message(target_word : str, forbidden : list) -> str:
+        """
+        Renders the system message of the agent for a card.
+        """
+        return f"""Eres una parte del juego de tabú. Tu misión es dar pistas para adivinar la palabra: {target_word}, sin usar ninguna palabra ni
                             derivados de las palabras de la siguiente lista: {",".join(forbidden)}. Si te proporcionan pistas que has dado anteriormente,
                             tenlas en cuenta para aportar información nueva. Sólo debes generar pistas basándote en los criterios. No des pistas de más de 15 palabras"""
-        super().__init__(name=name, system_message=system_message, model_client=model_client)
+
+    def set_card(self, target_word : str, forbidden : list) -> None:
+        """
+        Re-targets the agent to a new card, replacing its system message.
+        The conversation of the previous card is cleared by `on_reset`.
+
+        Args:
+            target_word (str): The word the player needs to guess.
+            forbidden (list): A list of forbidden words that cannot be used in the hints.
+        """
+        replace_system_message(self, self.build_system_message(target_word, forbidden))
 
 class HintEvaluator(AssistantAgent):
     """
@@ -37,11 +85,65 @@ class HintEvaluator(AssistantAgent):
     """
     def __init__(self, target_word : str, forbidden : list, model_client : OpenAIChatCompletionClient):
         name="Hint_Evaluator"
-        system_message=f"""Tienes que recoger el texto que te manden y analizarlo con la función evaluate_hint, pasando como forbidden_words la 
-                           lista {",".join(forbidden + [target_word])}"""
+        system_message=self.build_system_message(target_word, forbidden)
         tools=[evaluate_hint]
         super().__init__(name=name, system_message=system_message, model_client=model_client, tools=tools)
 
+    @staticmethod
+    def build_system_message(target_word : str, forbidden : list) -> str:
+        """
+        Renders the system message of the agent for a card.
+        """
+        return f"""Tienes que recoger el texto que te manden y analizarlo con la función evaluate_hint, pasando como forbidden_words la 
+                           lista {",".join(list(forbidden) + [target_word])}"""
+
+    def set_card(self, target_word : str, forbidden : list) -> None:
+        """
+        Re-targets the agent to a new card, replacing its system message. The evaluate_hint tool is kept.
+
+        Args:
+            target_word (str): The target word that players are trying to guess.
+            forbidden (list): A list of forbidden words that cannot appear in hints.
+        """
+        replace_system_message(self, self.build_system_message(target_word, forbidden))
+
+class LocalHintEvaluator(BaseChatAgent):
+    """
+    An agent that evaluates hints in the Taboo game without calling a language model.
+
+    This agent runs the same checks as the `evaluate_hint` function directly, with the forbidden words
+    of the card compiled once, and answers 'PISTA PROHIBIDA' or 'OK' like the HintEvaluator does.
+
+    Attributes:
+        matcher (ForbiddenMatcher): The matcher with the forbidden words of the card and the target word.
+    """
+    def __init__(self, target_word : str, forbidden : list):
+        name = "Hint_Evaluator"
+        description = "Evaluates whether a hint uses forbidden words with the evaluate_hint logic."
+        super().__init__(name=name, description=description)
+        self.matcher = ForbiddenMatcher.from_card(target_word, forbidden)
+
+    def set_card(self, target_word : str, forbidden : list) -> None:
+        """
+        Re-targets the agent to a new card, compiling its forbidden words.
+
+        Args:
+            target_word (str): The target word that players are trying to guess.
+            forbidden (list): A list of forbidden words that cannot appear in hints.
+        """
+        self.matcher = ForbiddenMatcher.from_card(target_word, forbidden)
+
+    @property
+    def produced_message_types(self) -> tuple:
+        return (TextMessage,)
+
+    async def on_messages(self, messages : list, cancellation_token : CancellationToken) -> Response:
+        evaluation = self.matcher.evaluate(messages[-1].content)
+        return Response(chat_message=TextMessage(content=evaluation, source=self.name))
+
+    async def on_reset(self, cancellation_token : CancellationToken) -> None:
+        pass
+
 class GuessGenerator(AssistantAgent):
     """
     An agent responsible for generating guesses in the Taboo game.
@@ -51,12 +153,13 @@ class GuessGenerator(AssistantAgent):
 
     Attributes:
         model_client (OpenAIChatCompletionClient): The language model client used to generate guesses.
+        model_context (ChatCompletionContext): The memory of the agent within a card. None to keep the whole conversation.
     """
-    def __init__(self, model_client : OpenAIChatCompletionClient):
+    def __init__(self, model_client : OpenAIChatCompletionClient, model_context : ChatCompletionContext = None):
         name="Guess_Generator"
         system_message=f"""Eres una parte del juego de tabú. Tu misión es adivinar la palabra escuchando las pistas dadas por el otro jugador. 
                            No repitas ninguna de las respuestas dadas anteriormente. Contesta únicamente la palabra que quieras responder."""
-        super().__init__(name=name, system_message=system_message, model_client=model_client)
+        super().__init__(name=name, system_message=system_message, model_client=model_client, model_context=model_context)
         
 class GuessEvaluator(AssistantAgent):
     """
@@ -72,10 +175,108 @@ class GuessEvaluator(AssistantAgent):
     """
     def __init__(self, target_word : str, model_client : OpenAIChatCompletionClient):
         name="Guess_Evaluator"
-        system_message=f"""Eres una parte del juego de tabú. Tu misión es evaluar si el jugador ha adivinado la palabra correcta y contestar'ACIERTO' o 'RESPUESTA INCORRECTA'. 
+        system_message=self.build_system_message(target_word)
+        super().__init__(name=name, system_message=system_message, model_client=model_client)
+
+    @staticmethod
+    def build_system_message(target_word : str) -> str:
+        """
+        Renders the system message of the agent for a card.
+        """
+        return f"""Eres una parte del juego de tabú. Tu misión es evaluar si el jugador ha adivinado la palabra correcta y contestar'ACIERTO' o 'RESPUESTA INCORRECTA'. 
                            Para evaluar si se ha acertado, la palabra debe ser la misma o significar exactamente lo mismo que la siguiente palabra: {target_word}
                            Solo puedes contestar "ACIERTO" o "NOK", tienes terminantemente prohibido contestar cualquier otra cosa."""
-        super().__init__(name=name, system_message=system_message, model_client=model_client)
+
+    def set_card(self, target_word : str) -> None:
+        """
+        Re-targets the agent to a new card, replacing its system message.
+
+        Args:
+            target_word (str): The target word the player must guess.
+        """
+        replace_system_message(self, self.build_system_message(target_word))
+
+class BatchedGuessEvaluator(BaseChatAgent):
+    """
+    An agent that evaluates guesses like the GuessEvaluator, but sends them to a GuessBatcher shared by many rounds,
+    which evaluates the guesses of all of them in a single request.
+
+    Attributes:
+        target_word (str): The target word the player must guess.
+        batcher (GuessBatcher): The batcher shared by the rounds.
+    """
+    def __init__(self, target_word : str, batcher : "GuessBatcher"):
+        name = "Guess_Evaluator"
+        description = "Evaluates whether a guess is correct, batched with the guesses of other rounds."
+        super().__init__(name=name, description=description)
+        self.target_word = target_word
+        self.batcher = batcher
+
+    def set_card(self, target_word : str) -> None:
+        """
+        Re-targets the agent to a new card.
+
+        Args:
+            target_word (str): The target word the player must guess.
+        """
+        self.target_word = target_word
+
+    @property
+    def produced_message_types(self) -> tuple:
+        return (TextMessage,)
+
+    async def on_messages(self, messages : list, cancellation_token : CancellationToken) -> Response:
+        evaluation = await self.batcher.evaluate(self.target_word, messages[-1].content)
+        return Response(chat_message=TextMessage(content=evaluation, source=self.name))
+
+    async def on_reset(self, cancellation_token : CancellationToken) -> None:
+        pass
+
+class LocalGuessEvaluator(BaseChatAgent):
+    """
+    An agent that evaluates guesses in the Taboo game locally, asking the GuessEvaluator only when it is needed.
+
+    Clear hits (the target word, its plural or lemma, or a synonym of the card) and repeated guesses
+    are answered without calling a language model.
+    Ambiguous guesses are sent to the GuessEvaluator agent and its answer is remembered for the card.
+
+    Attributes:
+        matcher (GuessMatcher): The local matcher for the guesses of the card.
+        fallback (GuessEvaluator | BatchedGuessEvaluator): The agent that evaluates ambiguous guesses.
+    """
+    def __init__(self, target_word : str, fallback : GuessEvaluator, synonyms : list = None):
+        name = "Guess_Evaluator"
+        description = "Evaluates whether a guess is correct, asking an LLM only for ambiguous guesses."
+        super().__init__(name=name, description=description)
+        self.matcher = GuessMatcher(target_word, synonyms)
+        self.fallback = fallback
+
+    def set_card(self, target_word : str, synonyms : list = None) -> None:
+        """
+        Re-targets the agent and its fallback to a new card, forgetting the guesses of the previous card.
+
+        Args:
+            target_word (str): The target word the player must guess.
+            synonyms (list): Words accepted as hits besides the target word.
+        """
+        self.matcher = GuessMatcher(target_word, synonyms)
+        self.fallback.set_card(target_word)
+
+    @property
+    def produced_message_types(self) -> tuple:
+        return (TextMessage,)
+
+    async def on_messages(self, messages : list, cancellation_token : CancellationToken) -> Response:
+        guess = messages[-1].content
+        evaluation = self.matcher.evaluate(guess)
+        if evaluation is not None:
+            return Response(chat_message=TextMessage(content=evaluation, source=self.name))
+        response = await self.fallback.on_messages(messages, cancellation_token)
+        self.matcher.record(guess, response.chat_message.content)
+        return response
+
+    async def on_reset(self, cancellation_token : CancellationToken) -> None:
+        await self.fallback.on_reset(cancellation_token)
 
 class Player(UserProxyAgent):
     """
@@ -86,7 +287,8 @@ class Player(UserProxyAgent):
 
     Attributes:
         name (str): The name of the agent representing the player.
+        input_func (callable): The function used to read the player's messages.
     """
-    def __init__(self):
+    def __init__(self, input_func = input):
         name="Player"
-        super().__init__(name=name, input_func=input)
+        super().__init__(name=name, input_func=input_func)
@@ -0,0 +1,121 @@
+import asyncio
+import json
+from autogen_core.models import ChatCompletionClient, SystemMessage, UserMessage
+from .agents import GuessEvaluator
+
+# System message of the batched evaluation requests
+BATCH_SYSTEM_MESSAGE = """Eres una parte del juego de tabú. Tu misión es evaluar varias respuestas a la vez.
+Recibirás una lista JSON de pares con la palabra que había que adivinar ("palabra") y la respuesta del jugador ("respuesta").
+Una respuesta es un acierto si es la misma palabra o significa exactamente lo mismo que la palabra que había que adivinar.
+Contesta únicamente con un objeto JSON {"resultados": [...]} con "ACIERTO" o "NOK" para cada par, en el mismo orden."""
+
+class GuessBatcher():
+    """
+    Evaluates the ambiguous guesses of many concurrent rounds in a single model request.
+
+    The guesses are collected for a short window (or until the batch is full) and judged together with a JSON request.
+    The verdicts are returned to the waiting rounds. If the response can't be parsed, the guesses of the batch
+    are evaluated one by one, as the GuessEvaluator does.
+
+    Attributes:
+        model_client (ChatCompletionClient): The deterministic (temperature 0) client used to evaluate the guesses.
+        window (float): Time the first guess of a batch waits for more guesses, in seconds.
+        max_batch (int): Maximum number of guesses of a batch. A full batch is sent without waiting for the window.
+        requests (int): Number of evaluation requests sent.
+        guesses (int): Number of guesses sent, including the ones evaluated again one by one.
+        fallbacks (int): Number of guesses evaluated one by one because the response of their batch was not valid.
+    """
+    def __init__(self, model_client : ChatCompletionClient, window : float = 0.05, max_batch : int = 20):
+        self.model_client = model_client
+        self.window = window
+        self.max_batch = max_batch
+        self.requests = 0
+        self.guesses = 0
+        self.fallbacks = 0
+        self._pending = []
+        self._timer = None
+        # The batches being evaluated. The event loop only keeps weak references to its tasks
+        self._tasks = set()
+
+    async def evaluate(self, target_word : str, guess : str) -> str:
+        """
+        Adds a guess to the current batch and waits for its verdict.
+
+        Args:
+            target_word (str): The target word of the card.
+            guess (str): The guess.
+
+        Returns (str): 'ACIERTO' or 'NOK'.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((target_word, guess, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._evaluate_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _evaluate_batch(self, batch : list) -> None:
+        try:
+            verdicts = await self._request_batch(batch) if len(batch) > 1 else None
+            if verdicts is None:
+                # A single guess is sent as the GuessEvaluator would send it
+                if len(batch) > 1:
+                    self.fallbacks += len(batch)
+                verdicts = await asyncio.gather(*(self._request_single(target_word, guess) for target_word, guess, _ in batch))
+            for (_, _, future), verdict in zip(batch, verdicts):
+                if not future.done():
+                    future.set_result(verdict)
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+    async def _request_batch(self, batch : list) -> list:
+        """
+        Evaluates a batch of guesses in a single JSON request.
+
+        Args:
+            batch (list): The target word, guess and future of each guess.
+
+        Returns (list): The verdict of each guess, or None if the response is not a valid list of verdicts.
+        """
+        items = [{'palabra' : target_word, 'respuesta' : guess} for target_word, guess, _ in batch]
+        messages = [SystemMessage(content=BATCH_SYSTEM_MESSAGE),
+                    UserMessage(content=json.dumps(items, ensure_ascii=False), source='system')]
+        self.requests += 1
+        self.guesses += len(batch)
+        result = await self.model_client.create(messages, json_output=True)
+        try:
+            verdicts = json.loads(result.content)['resultados']
+        except (TypeError, ValueError, KeyError):
+            return None
+        if not isinstance(verdicts, list) or len(verdicts) != len(batch) or any(verdict not in ('ACIERTO', 'NOK') for verdict in verdicts):
+            return None
+        return verdicts
+
+    async def _request_single(self, target_word : str, guess : str) -> str:
+        messages = [SystemMessage(content=GuessEvaluator.build_system_message(target_word)), UserMessage(content=guess, source='system')]
+        self.requests += 1
+        self.guesses += 1
+        result = await self.model_client.create(messages)
+        return result.content
+
+    def stats(self) -> str:
+        """
+        Builds a printable summary of the batched evaluations.
+
+        Returns (str): The summary.
+        """
+        return (f'EVALUACIÓN POR LOTES : {self.guesses} respuestas en {self.requests} peticiones, '
+                f'{self.fallbacks} evaluadas una a una')
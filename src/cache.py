@@ -0,0 +1,96 @@
+import hashlib
+import json
+import sqlite3
+import time
+
+class ResponseCache():
+    """
+    Persistent cache of model responses, stored in a SQLite database.
+
+    When the cache holds more than max_entries responses, the least recently used ones are evicted.
+
+    Attributes:
+        path (str): Path of the SQLite database.
+        max_entries (int): Maximum number of responses kept in the cache.
+        hits (int): Number of requests answered by the cache.
+        misses (int): Number of requests not found in the cache.
+    """
+    def __init__(self, path : str, max_entries : int = 10000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, result TEXT NOT NULL, last_used REAL NOT NULL)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self.connection.commit()
+        self._size = self.connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def make_key(model : str, messages : list, tools : list = [], json_output = None) -> str:
+        """
+        Builds the key of a request from the model, the type and content of its messages and its tools.
+
+        Args:
+            model (str): The model of the request.
+            messages (list): The messages of the request, including the system message.
+            tools (list): The tools of the request.
+            json_output (bool): Whether the request asks for JSON output.
+
+        Returns (str): The key of the request.
+        """
+        request = {
+            'model' : model,
+            'messages' : [[type(message).__name__, message.content] for message in messages],
+            'tools' : sorted(getattr(tool, 'name', None) or tool['name'] for tool in tools),
+            'json_output' : json_output if isinstance(json_output, (bool, type(None))) else json_output.__name__,
+        }
+        return hashlib.sha256(json.dumps(request, default=repr, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+    def get(self, key : str) -> str:
+        """
+        Looks for a response in the cache, marking it as recently used.
+
+        Args:
+            key (str): The key of the request.
+
+        Returns (str): The serialized response, or None if it is not in the cache.
+        """
+        row = self.connection.execute("SELECT result FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.connection.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+        self.connection.commit()
+        return row[0]
+
+    def put(self, key : str, result : str) -> None:
+        """
+        Stores a response in the cache, evicting the least recently used responses if the cache is full.
+
+        Args:
+            key (str): The key of the request.
+            result (str): The serialized response.
+        """
+        inserted = self.connection.execute("INSERT OR IGNORE INTO responses VALUES (?, ?, ?)", (key, result, time.time())).rowcount
+        self._size += inserted
+        if self._size > self.max_entries:
+            self.connection.execute("DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_used LIMIT ?)",
+                                    (self._size - self.max_entries,))
+            self._size = self.max_entries
+        self.connection.commit()
+
+    def stats(self) -> str:
+        """
+        Builds a printable summary of the hits and misses of the cache.
+
+        Returns (str): The summary.
+        """
+        return f'CACHÉ : {self.hits} aciertos, {self.misses} fallos, {self._size} respuestas guardadas'
+
+    def close(self) -> None:
+        """
+        Closes the database.
+        """
+        self.connection.close()
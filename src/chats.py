@@ -1,13 +1,36 @@
-import os
 import asyncio
-from autogen_agentchat.agents import AssistantAgent, UserProxyAgent
+import re
+from autogen_agentchat.agents import AssistantAgent, BaseChatAgent, UserProxyAgent
 from autogen_agentchat.base import Response
-from autogen_agentchat.messages import TextMessage
+from autogen_agentchat.messages import ModelClientStreamingChunkEvent, TextMessage
 from autogen_core import CancellationToken
-from autogen_ext.models.openai import OpenAIChatCompletionClient
-from .agents import HintEvaluator, HintGenerator, GuessEvaluator, GuessGenerator, Player
+from autogen_core.models import AssistantMessage, UserMessage
+from .agents import (BatchedGuessEvaluator, HintEvaluator, HintGenerator, GuessEvaluator, GuessGenerator, LocalGuessEvaluator,
+                     LocalHintEvaluator, Player)
+from .batching import GuessBatcher
+from .clients import ModelClientPool
+from .console import output
+from .evaluate_hint import ForbiddenMatcher, get_forbidden_matcher
+from .memory import build_model_context
+from .tracing import response_usage, set_trace_context, trace
 
-async def assistant_run(agent : AssistantAgent, text_message : TextMessage) -> Response:
+# Labels of the previous tries in the summaries of the 'summary' memory policy
+PREVIOUS_HINTS_LABEL = "Pistas anteriores"
+PREVIOUS_GUESSES_LABEL = "Respuestas anteriores"
+# Message sent to the hint generator when its hint is aborted for using a forbidden word
+REGENERATE_HINT_MESSAGE = "La pista anterior usaba una palabra prohibida. Da otra pista sin usarla."
+
+def print_response(response : Response) -> None:
+    """
+    Prints the message of an agent's response, preceded by the agent's name.
+
+    Args:
+        response (Response): The agent's response.
+    """
+    output(f'{response.chat_message.source} : {response.chat_message.content}')
+
+async def assistant_run(agent : AssistantAgent, text_message : TextMessage, verbose : bool = True,
+                        cancellation_token : CancellationToken = None) -> Response:
     """
     Runs an assistant agent with the given message.
     This function sends a message to an AssistantAgent and retrieves its response.
@@ -15,14 +38,160 @@ async def assistant_run(agent : AssistantAgent, text_message : TextMessage) -> R
     Args:
         agent (AssistantAgent): The assistant agent that processes the message.
         text_message (TextMessage): The message to be processed.
+        verbose (bool): Whether the response is printed.
+        cancellation_token (CancellationToken): Token to cancel the run. A new token if None.
 
     Returns:
         response (Response): The agent's response message.
     """
-    response = await agent.on_messages([text_message], cancellation_token=CancellationToken())
-    print(f'{response.chat_message.source} : {response.chat_message.content}')
+    with trace('agent', agent.name) as event:
+        response = await agent.on_messages([text_message], cancellation_token=cancellation_token or CancellationToken())
+        event.update(response_usage(response))
+    if verbose:
+        print_response(response)
+    return response
+
+async def assistant_run_stream(agent : AssistantAgent, text_message : TextMessage, matcher : ForbiddenMatcher,
+                               verbose : bool = True) -> Response:
+    """
+    Runs a streaming assistant agent with the given message, printing the chunks of the response as they arrive.
+    Every word is checked with the matcher as soon as it is complete. If the response uses a forbidden word,
+    the model request is cancelled, so the rest of the response is not generated. The aborted text is added
+    to the agent's conversation, so the model sees which hint used the forbidden word before it is asked for another one.
+
+    Args:
+        agent (AssistantAgent): The assistant agent that processes the message, created with streaming enabled.
+        text_message (TextMessage): The message to be processed.
+        matcher (ForbiddenMatcher): The matcher with the forbidden words of the card.
+        verbose (bool): Whether the response is printed.
+
+    Returns (Response): The agent's response, or None if the response was aborted.
+    """
+    cancellation_token = CancellationToken()
+    stream = agent.on_messages_stream([text_message], cancellation_token=cancellation_token)
+    text = ''
+    checked = 0
+
+    def forbidden_word_end(words : list) -> int:
+        # Checks the words not checked yet and returns the end of the first forbidden one, or None
+        nonlocal checked
+        for word in words[checked:]:
+            checked += 1
+            # The single word check is cheap; the sentence is only analyzed (ignoring articles, prepositions...)
+            # when the word looks forbidden
+            if matcher.is_forbidden(word.group()) and matcher.evaluate(text[:word.end()]) == 'PISTA PROHIBIDA':
+                return word.end()
+        return None
+
+    if verbose:
+        output(f'{agent.name} : ', end='', flush=True)
+    with trace('agent', agent.name) as event:
+        try:
+            async for message in stream:
+                if isinstance(message, Response):
+                    event.update(response_usage(message))
+                    if isinstance(message.chat_message.content, str):
+                        text = message.chat_message.content
+                    # The last word is complete when the response ends. The whole response is already in the agent's conversation
+                    if forbidden_word_end(list(re.finditer(r'\w+', text))) is not None:
+                        event['aborted'] = True
+                        if verbose:
+                            output(' [PISTA PROHIBIDA]')
+                        return None
+                    if verbose:
+                        output()
+                    return message
+                if not isinstance(message, ModelClientStreamingChunkEvent):
+                    continue
+                if verbose:
+                    output(message.content, end='', flush=True)
+                text += message.content
+                # The last word is not complete until a separator arrives
+                words = list(re.finditer(r'\w+', text))
+                if words and words[-1].end() == len(text):
+                    words.pop()
+                end = forbidden_word_end(words)
+                if end is not None:
+                    cancellation_token.cancel()
+                    event['aborted'] = True
+                    await agent.model_context.add_message(AssistantMessage(content=text[:end], source=agent.name))
+                    if verbose:
+                        output(' [PISTA PROHIBIDA]')
+                    return None
+        finally:
+            await stream.aclose()
+
+async def hint_run_stream(agent : HintGenerator, matcher : ForbiddenMatcher, verbose : bool = True,
+                          max_regenerations : int = 2) -> Response:
+    """
+    Generates a hint streaming it. If the hint uses a forbidden word, it is aborted and generated again.
+
+    Args:
+        agent (HintGenerator): The hint generator, created with streaming enabled.
+        matcher (ForbiddenMatcher): The matcher with the forbidden words of the card.
+        verbose (bool): Whether the hints are printed.
+        max_regenerations (int): Maximum number of times an aborted hint is generated again.
+
+    Returns (Response): The hint generator's response, or None if every hint was aborted.
+    """
+    text_message = TextMessage(content="Da una pista.", source="system")
+    for _ in range(max_regenerations + 1):
+        response = await assistant_run_stream(agent, text_message, matcher, verbose)
+        if response is not None:
+            return response
+        text_message = TextMessage(content=REGENERATE_HINT_MESSAGE, source="system")
+    return None
+
+async def bank_hint_run(agent : HintGenerator, hint : str, verbose : bool = True) -> Response:
+    """
+    Serves a hint of the hint bank as the hint generator's response, without calling the model.
+    The hint is added to the generator's conversation, so the hints generated after it don't repeat it.
+
+    Args:
+        agent (HintGenerator): The hint generator.
+        hint (str): The hint of the bank.
+        verbose (bool): Whether the hint is printed.
+
+    Returns (Response): The hint, as the hint generator's response.
+    """
+    await agent.model_context.add_message(UserMessage(content="Da una pista.", source="system"))
+    await agent.model_context.add_message(AssistantMessage(content=hint, source=agent.name))
+    response = Response(chat_message=TextMessage(content=hint, source=agent.name))
+    if verbose:
+        print_response(response)
     return response
 
+def start_assistant_run(agent : AssistantAgent, text_message : TextMessage) -> tuple:
+    """
+    Starts running an assistant agent in the background, without printing its response.
+
+    Args:
+        agent (AssistantAgent): The assistant agent that processes the message.
+        text_message (TextMessage): The message to be processed.
+
+    Returns (tuple): The task of the run and the token to cancel it.
+    """
+    cancellation_token = CancellationToken()
+    task = asyncio.create_task(assistant_run(agent, text_message, False, cancellation_token))
+    return task, cancellation_token
+
+async def cancel_run(run : tuple) -> None:
+    """
+    Cancels a run started with start_assistant_run, aborting its pending model request, and waits for it to end.
+
+    Args:
+        run (tuple): The task of the run and its cancellation token. Nothing is done if None.
+    """
+    if run is None:
+        return
+    task, cancellation_token = run
+    cancellation_token.cancel()
+    task.cancel()
+    try:
+        await task
+    except (asyncio.CancelledError, Exception):
+        pass
+
 async def user_proxy_run(agent : UserProxyAgent, text_message : TextMessage) -> Response:
     """
     Runs a user proxy agent asynchronously.
@@ -35,11 +204,64 @@ async def user_proxy_run(agent : UserProxyAgent, text_message : TextMessage) ->
     Returns:
         response (Response): The agent's response message.
     """
-    response = await asyncio.create_task(
-        agent.on_messages([text_message], cancellation_token=CancellationToken())
-    )
+    with trace('player', agent.name):
+        response = await asyncio.create_task(
+            agent.on_messages([text_message], cancellation_token=CancellationToken())
+        )
     return response
 
+def build_hint_evaluator(hint_validation : str, model_clients : ModelClientPool, model : str, forbidden : list,
+                         target_word : str) -> BaseChatAgent:
+    """
+    Builds the agent that validates the hints of a round.
+
+    Args:
+        hint_validation (str): 'local' to run the evaluate_hint logic in process, 'llm' to let a HintEvaluator
+                               agent call it as a tool.
+        model_clients (ModelClientPool): The pool of model clients of the game.
+        model (str): The language model used by the HintEvaluator.
+        forbidden (list): A list of forbidden words in the game.
+        target_word (str): The word to be guessed.
+
+    Returns (BaseChatAgent): The hint evaluator agent.
+    """
+    if hint_validation == 'local':
+        return LocalHintEvaluator(target_word, forbidden)
+    elif hint_validation == 'llm':
+        return HintEvaluator(target_word, forbidden, model_clients.get(model, temperature=0))
+    raise ValueError(f"Unknown hint validation mode: {hint_validation}")
+
+def build_guess_evaluator(model_clients : ModelClientPool, model : str, target_word : str, synonyms : list = None,
+                          guess_batcher : GuessBatcher = None) -> BaseChatAgent:
+    """
+    Builds the agent that evaluates the guesses of a round: a local pre-check in front of the GuessEvaluator agent.
+
+    Args:
+        model_clients (ModelClientPool): The pool of model clients of the game.
+        model (str): The language model used by the GuessEvaluator.
+        target_word (str): The word to be guessed.
+        synonyms (list): Words accepted as hits besides the target word.
+        guess_batcher (GuessBatcher): Batcher that evaluates the ambiguous guesses of many rounds together.
+                                      None to evaluate them one by one with the GuessEvaluator.
+
+    Returns (BaseChatAgent): The guess evaluator agent.
+    """
+    if guess_batcher is not None:
+        fallback = BatchedGuessEvaluator(target_word, guess_batcher)
+    else:
+        fallback = GuessEvaluator(target_word, model_clients.get(model, temperature=0))
+    return LocalGuessEvaluator(target_word, fallback, synonyms)
+
+async def reset_agents(*agents) -> None:
+    """
+    Clears the conversation of the given agents, so they can be used for a new card.
+
+    Args:
+        agents (BaseChatAgent): The agents to reset.
+    """
+    for agent in agents:
+        await agent.on_reset(CancellationToken())
+
 class PlayerHintChat():
     """
     Handles the game round where the player gives hints.
@@ -48,27 +270,39 @@ class PlayerHintChat():
     guess generator, and guess evaluator.
 
     Attributes:
+        model_clients (ModelClientPool): The pool of model clients shared by the game.
         model (str): The language model used for OpenAI API calls.
         forbidden (list): A list of forbidden words in the game.
         target_word (str): The word to be guessed.
-        hint_evaluator (HintEvaluator): Evaluates whether the hint follows the rules.
+        hint_evaluator (BaseChatAgent): Evaluates whether the hint follows the rules, in process or through an LLM.
         guess_generator (GuessGenerator): Generates a guess based on hints.
-        guess_evaluator (GuessEvaluator): Evaluates whether the guess is correct.
-        player (Player): Represents the user playing the game.
+        guess_evaluator (LocalGuessEvaluator): Evaluates whether the guess is correct, locally or through an LLM.
+        player (Player): Represents the user playing the game, reading the messages with input_func.
     """
-    def __init__(self, model : str, forbidden : list, target_word : str):
+    def __init__(self, model_clients : ModelClientPool, model : str, forbidden : list, target_word : str,
+                 hint_validation : str = 'local', synonyms : list = None, input_func = input, memory : str = 'full'):
         self.target_word = target_word
         self.forbidden = forbidden
-        self.hint_evaluator = HintEvaluator(target_word, forbidden,  OpenAIChatCompletionClient(model=model, 
-                                                                                                api_key=os.environ['OPENAI_API_KEY'],
-                                                                                                temperature=0))
-        self.guess_generator = GuessGenerator(OpenAIChatCompletionClient(model=model, 
-                                                                         api_key=os.environ['OPENAI_API_KEY']))
-        self.guess_evaluator = GuessEvaluator(target_word,  OpenAIChatCompletionClient(model=model, 
-                                                                                       api_key=os.environ['OPENAI_API_KEY'],
-                                                                                       temperature=0))
-        self.player = Player()
+        self.hint_evaluator = build_hint_evaluator(hint_validation, model_clients, model, forbidden, target_word)
+        self.guess_generator = GuessGenerator(model_clients.get(model),
+                                              build_model_context(memory, PREVIOUS_GUESSES_LABEL, PREVIOUS_HINTS_LABEL))
+        self.guess_evaluator = build_guess_evaluator(model_clients, model, target_word, synonyms)
+        self.player = Player(input_func)
+
+    async def set_card(self, forbidden : list, target_word : str, synonyms : list = None) -> None:
+        """
+        Re-targets the chat and its agents to a new card, clearing the conversations of the previous card.
 
+        Args:
+            forbidden (list): A list of forbidden words in the game.
+            target_word (str): The word to be guessed.
+            synonyms (list): Words accepted as hits besides the target word.
+        """
+        self.target_word = target_word
+        self.forbidden = forbidden
+        self.hint_evaluator.set_card(target_word, forbidden)
+        self.guess_evaluator.set_card(target_word, synonyms)
+        await reset_agents(self.hint_evaluator, self.guess_generator, self.guess_evaluator)
 
     async def initiate_round(self) -> tuple:
         """
@@ -79,6 +313,7 @@ class PlayerHintChat():
         """
         tries = 1
         while tries <= 10:
+            set_trace_context(try_number=tries)
             user_hint = await user_proxy_run(self.player, TextMessage(content="start", source="system"))
             if user_hint.chat_message.content == 'PASO' or user_hint.chat_message.content == 'SALIR':
                 return user_hint.chat_message.content, tries
@@ -101,27 +336,71 @@ class PlayerGuessChat():
     and guess evaluator.
 
     Attributes:
+        model_clients (ModelClientPool): The pool of model clients shared by the game.
         model (str): The language model used for OpenAI API calls.
         forbidden (list): A list of forbidden words in the game.
         target_word (str): The word to be guessed.
         hint_generator (HintGenerator): Generates hints for the player.
-        hint_evaluator (HintEvaluator): Evaluates whether the hint follows the rules.
-        guess_evaluator (GuessEvaluator): Evaluates whether the guess is correct.
-        player (Player): Represents the user playing the game.
+        hint_evaluator (BaseChatAgent): Evaluates whether the hint follows the rules, in process or through an LLM.
+        guess_evaluator (LocalGuessEvaluator): Evaluates whether the guess is correct, locally or through an LLM.
+        player (Player): Represents the user playing the game, reading the messages with input_func.
+        prefetched_hint (tuple): The first hint of the card and its evaluation, generated in advance. None if there is none,
+                                 (None, None) if every streamed hint used a forbidden word.
+        streaming (bool): Whether the hints are streamed, aborting and regenerating the ones that use forbidden words.
+        bank_hints (list): The hints of the card left in the hint bank, given before generating new ones.
     """
-    def __init__(self, model : str, forbidden : list, target_word : str):
+    def __init__(self, model_clients : ModelClientPool, model : str, forbidden : list, target_word : str,
+                 hint_validation : str = 'local', synonyms : list = None, input_func = input, streaming : bool = False,
+                 memory : str = 'full', hints : list = None):
 
+        self.prefetched_hint = None
+        self.streaming = streaming
+        self.bank_hints = list(hints or [])
+        self.target_word = target_word
+        self.forbidden = forbidden
+        self.hint_generator = HintGenerator(target_word, forbidden, model_clients.get(model), streaming,
+                                            build_model_context(memory, PREVIOUS_HINTS_LABEL))
+        self.hint_evaluator = build_hint_evaluator(hint_validation, model_clients, model, forbidden, target_word)
+        self.guess_evaluator = build_guess_evaluator(model_clients, model, target_word, synonyms)
+        self.player = Player(input_func)
+
+    async def set_card(self, forbidden : list, target_word : str, synonyms : list = None, hints : list = None) -> None:
+        """
+        Re-targets the chat and its agents to a new card, clearing the conversations of the previous card.
+
+        Args:
+            forbidden (list): A list of forbidden words in the game.
+            target_word (str): The word to be guessed.
+            synonyms (list): Words accepted as hits besides the target word.
+            hints (list): The hints of the card in the hint bank.
+        """
+        self.prefetched_hint = None
+        self.bank_hints = list(hints or [])
         self.target_word = target_word
         self.forbidden = forbidden
-        self.hint_generator = HintGenerator(target_word, forbidden, OpenAIChatCompletionClient(model=model, 
-                                                                                               api_key=os.environ['OPENAI_API_KEY']))
-        self.hint_evaluator = HintEvaluator(target_word, forbidden,  OpenAIChatCompletionClient(model=model, 
-                                                                                                api_key=os.environ['OPENAI_API_KEY'],
-                                                                                                temperature=0))
-        self.guess_evaluator = GuessEvaluator(target_word,  OpenAIChatCompletionClient(model=model, 
-                                                                                       api_key=os.environ['OPENAI_API_KEY'],
-                                                                                       temperature=0))
-        self.player = Player()
+        self.hint_generator.set_card(target_word, forbidden)
+        self.hint_evaluator.set_card(target_word, forbidden)
+        self.guess_evaluator.set_card(target_word, synonyms)
+        await reset_agents(self.hint_generator, self.hint_evaluator, self.guess_evaluator)
+
+    async def prefetch_hint(self) -> None:
+        """
+        Generates and validates the first hint of the card in advance, without printing it,
+        so the round can start without waiting for the model.
+        """
+        if self.bank_hints:
+            assistant_hint = await bank_hint_run(self.hint_generator, self.bank_hints.pop(0), False)
+        elif self.streaming:
+            # The hints that use forbidden words are regenerated as in the round
+            assistant_hint = await hint_run_stream(self.hint_generator, get_forbidden_matcher(tuple(self.forbidden) + (self.target_word,)), False)
+            if assistant_hint is None:
+                self.prefetched_hint = (None, None)
+                return
+        else:
+            assistant_hint = await assistant_run(self.hint_generator, TextMessage(content="Da una pista.", source="system"), False)
+        hint_evaluation = await assistant_run(self.hint_evaluator, assistant_hint.chat_message, False)
+        await self.hint_evaluator.on_reset(CancellationToken())
+        self.prefetched_hint = (assistant_hint, hint_evaluation)
     
     async def initiate_round(self) -> tuple:
         """
@@ -133,13 +412,32 @@ class PlayerGuessChat():
         tries = 1
         hints = []
         while tries <= 10:
-            assistant_hint = await assistant_run(self.hint_generator, TextMessage(content="Da una pista.", source="system"))
-            hint_evaluation = await assistant_run(self.hint_evaluator, assistant_hint.chat_message)
-            await self.hint_evaluator.on_reset(CancellationToken())
+            set_trace_context(try_number=tries)
+            if self.prefetched_hint is not None:
+                assistant_hint, hint_evaluation = self.prefetched_hint
+                self.prefetched_hint = None
+                if assistant_hint is None:
+                    return 'PISTA PROHIBIDA', tries
+                print_response(assistant_hint)
+                print_response(hint_evaluation)
+            elif self.bank_hints:
+                assistant_hint = await bank_hint_run(self.hint_generator, self.bank_hints.pop(0))
+                hint_evaluation = await assistant_run(self.hint_evaluator, assistant_hint.chat_message)
+                await self.hint_evaluator.on_reset(CancellationToken())
+            elif self.streaming:
+                assistant_hint = await hint_run_stream(self.hint_generator, get_forbidden_matcher(tuple(self.forbidden) + (self.target_word,)))
+                if assistant_hint is None:
+                    return 'PISTA PROHIBIDA', tries
+                hint_evaluation = await assistant_run(self.hint_evaluator, assistant_hint.chat_message)
+                await self.hint_evaluator.on_reset(CancellationToken())
+            else:
+                assistant_hint = await assistant_run(self.hint_generator, TextMessage(content="Da una pista.", source="system"))
+                hint_evaluation = await assistant_run(self.hint_evaluator, assistant_hint.chat_message)
+                await self.hint_evaluator.on_reset(CancellationToken())
             if hint_evaluation.chat_message.content == 'PISTA PROHIBIDA':
                 return hint_evaluation.chat_message.content, tries
             hints.append(f"- {assistant_hint.chat_message.content}")
-            print(f'Pistas dadas hasta ahora:\n' + "\n".join(hints))
+            output(f'Pistas dadas hasta ahora:\n' + "\n".join(hints))
             user_guess = await user_proxy_run(self.player, assistant_hint.chat_message)
             if user_guess.chat_message.content == 'PASO' or user_guess.chat_message.content == 'SALIR':
                 return user_guess.chat_message.content, tries
@@ -157,28 +455,54 @@ class CpuChat():
     guess generator, and guess evaluator.
 
     Attributes:
+        model_clients (ModelClientPool): The pool of model clients shared by the game.
         model (str): The language model used for OpenAI API calls.
         forbidden (list): A list of forbidden words in the game.
         target_word (str): The word to be guessed.
         hint_generator (HintGenerator): Generates hints.
-        hint_evaluator (HintEvaluator): Evaluates whether the hint follows the rules.
+        hint_evaluator (BaseChatAgent): Evaluates whether the hint follows the rules, in process or through an LLM.
         guess_generator (GuessGenerator): Generates guesses based on hints.
-        guess_evaluator (GuessEvaluator): Evaluates whether the guess is correct.
+        guess_evaluator (LocalGuessEvaluator): Evaluates whether the guess is correct, locally or through an LLM.
+        verbose (bool): Whether the messages of the round are printed.
+        pipelined (bool): Whether the agents of a try run overlapped (see initiate_pipelined_round).
+        streaming (bool): Whether the hints are streamed, aborting and regenerating the ones that use forbidden words.
+                          The hints generated in advance by the pipelined rounds are not streamed.
+        bank_hints (list): The hints of the card left in the hint bank, given before generating new ones.
     """
-    def __init__(self, model : str, forbidden : list, target_word : str):
+    def __init__(self, model_clients : ModelClientPool, model : str, forbidden : list, target_word : str,
+                 hint_validation : str = 'local', synonyms : list = None, verbose : bool = True, pipelined : bool = False,
+                 streaming : bool = False, memory : str = 'full', hints : list = None, guess_batcher : GuessBatcher = None):
+
+        self.verbose = verbose
+        self.bank_hints = list(hints or [])
+        self.pipelined = pipelined
+        self.streaming = streaming
+        self.target_word = target_word
+        self.forbidden = forbidden
+        self.hint_generator = HintGenerator(target_word, forbidden, model_clients.get(model), streaming,
+                                            build_model_context(memory, PREVIOUS_HINTS_LABEL))
+        self.hint_evaluator = build_hint_evaluator(hint_validation, model_clients, model, forbidden, target_word)
+        self.guess_generator = GuessGenerator(model_clients.get(model),
+                                              build_model_context(memory, PREVIOUS_GUESSES_LABEL, PREVIOUS_HINTS_LABEL))
+        self.guess_evaluator = build_guess_evaluator(model_clients, model, target_word, synonyms, guess_batcher)
+
+    async def set_card(self, forbidden : list, target_word : str, synonyms : list = None, hints : list = None) -> None:
+        """
+        Re-targets the chat and its agents to a new card, clearing the conversations of the previous card.
 
+        Args:
+            forbidden (list): A list of forbidden words in the game.
+            target_word (str): The word to be guessed.
+            synonyms (list): Words accepted as hits besides the target word.
+            hints (list): The hints of the card in the hint bank.
+        """
+        self.bank_hints = list(hints or [])
         self.target_word = target_word
         self.forbidden = forbidden
-        self.hint_generator = HintGenerator(target_word, forbidden, OpenAIChatCompletionClient(model=model, 
-                                                                                               api_key=os.environ['OPENAI_API_KEY']))
-        self.hint_evaluator = HintEvaluator(target_word, forbidden,  OpenAIChatCompletionClient(model=model, 
-                                                                                                api_key=os.environ['OPENAI_API_KEY'],
-                                                                                                temperature=0))
-        self.guess_generator = GuessGenerator(OpenAIChatCompletionClient(model=model, 
-                                                                         api_key=os.environ['OPENAI_API_KEY']))
-        self.guess_evaluator = GuessEvaluator(target_word,  OpenAIChatCompletionClient(model=model, 
-                                                                                       api_key=os.environ['OPENAI_API_KEY'],
-                                                                                       temperature=0))
+        self.hint_generator.set_card(target_word, forbidden)
+        self.hint_evaluator.set_card(target_word, forbidden)
+        self.guess_evaluator.set_card(target_word, synonyms)
+        await reset_agents(self.hint_generator, self.hint_evaluator, self.guess_generator, self.guess_evaluator)
     
     async def initiate_round(self) -> tuple:
         """
@@ -187,20 +511,87 @@ class CpuChat():
         Returns:
             tuple: The result of the round and the number of attempts.
         """
+        if self.pipelined:
+            return await self.initiate_pipelined_round()
         tries = 1
         hints = []
         while tries <= 10:
-            assistant_hint = await assistant_run(self.hint_generator, TextMessage(content="Da una pista.", source="system"))
-            hint_evaluation = await assistant_run(self.hint_evaluator, assistant_hint.chat_message)
+            set_trace_context(try_number=tries)
+            if self.bank_hints:
+                assistant_hint = await bank_hint_run(self.hint_generator, self.bank_hints.pop(0), self.verbose)
+            elif self.streaming:
+                assistant_hint = await hint_run_stream(self.hint_generator, get_forbidden_matcher(tuple(self.forbidden) + (self.target_word,)),
+                                                       self.verbose)
+                if assistant_hint is None:
+                    return 'PISTA PROHIBIDA', tries
+            else:
+                assistant_hint = await assistant_run(self.hint_generator, TextMessage(content="Da una pista.", source="system"), self.verbose)
+            hint_evaluation = await assistant_run(self.hint_evaluator, assistant_hint.chat_message, self.verbose)
             await self.hint_evaluator.on_reset(CancellationToken())
             if hint_evaluation.chat_message.content == 'PISTA PROHIBIDA':
                 return hint_evaluation.chat_message.content, tries
             hints.append(f"- {assistant_hint.chat_message.content}")
-            print(f'Pistas dadas hasta ahora:\n' + "\n".join(hints))
-            generated_guess = await assistant_run(self.guess_generator, assistant_hint.chat_message)
-            guess_evaluation = await assistant_run(self.guess_evaluator, generated_guess.chat_message)
+            if self.verbose:
+                output(f'Pistas dadas hasta ahora:\n' + "\n".join(hints))
+            generated_guess = await assistant_run(self.guess_generator, assistant_hint.chat_message, self.verbose)
+            guess_evaluation = await assistant_run(self.guess_evaluator, generated_guess.chat_message, self.verbose)
             await self.guess_evaluator.on_reset(CancellationToken())
             if guess_evaluation.chat_message.content == 'ACIERTO':
                 return guess_evaluation.chat_message.content, tries 
             tries += 1
-        return 'MÁXIMO DE INTENTOS ALCANZADO', tries
\ No newline at end of file
+        return 'MÁXIMO DE INTENTOS ALCANZADO', tries
+
+    def start_hint_run(self) -> tuple:
+        """
+        Starts getting the next hint in the background, from the hint bank or from the hint generator.
+
+        Returns (tuple): The task of the run and the token to cancel it.
+        """
+        if self.bank_hints:
+            return asyncio.create_task(bank_hint_run(self.hint_generator, self.bank_hints.pop(0), False)), CancellationToken()
+        return start_assistant_run(self.hint_generator, TextMessage(content="Da una pista.", source="system"))
+
+    async def initiate_pipelined_round(self) -> tuple:
+        """
+        Starts a fully automated game round, overlapping the agents of each try.
+        The guess is generated while the hint is being validated, and cancelled if the hint is forbidden.
+        The next hint is generated while the guess is being evaluated, and discarded if the guess is a hit.
+        The hint generator never sees the guesses, so the hints and the results are the same as in initiate_round.
+
+        Returns:
+            tuple: The result of the round and the number of attempts.
+        """
+        tries = 1
+        hints = []
+        guess_run = None
+        hint_run = self.start_hint_run()
+        try:
+            while tries <= 10:
+                set_trace_context(try_number=tries)
+                assistant_hint = await hint_run[0]
+                hint_run = None
+                if self.verbose:
+                    print_response(assistant_hint)
+                guess_run = start_assistant_run(self.guess_generator, assistant_hint.chat_message)
+                hint_evaluation = await assistant_run(self.hint_evaluator, assistant_hint.chat_message, self.verbose)
+                await self.hint_evaluator.on_reset(CancellationToken())
+                if hint_evaluation.chat_message.content == 'PISTA PROHIBIDA':
+                    return hint_evaluation.chat_message.content, tries
+                hints.append(f"- {assistant_hint.chat_message.content}")
+                if self.verbose:
+                    output(f'Pistas dadas hasta ahora:\n' + "\n".join(hints))
+                generated_guess = await guess_run[0]
+                guess_run = None
+                if self.verbose:
+                    print_response(generated_guess)
+                if tries < 10:
+                    hint_run = self.start_hint_run()
+                guess_evaluation = await assistant_run(self.guess_evaluator, generated_guess.chat_message, self.verbose)
+                await self.guess_evaluator.on_reset(CancellationToken())
+                if guess_evaluation.chat_message.content == 'ACIERTO':
+                    return guess_evaluation.chat_message.content, tries
+                tries += 1
+            return 'MÁXIMO DE INTENTOS ALCANZADO', tries
+        finally:
+            await cancel_run(guess_run)
+            await cancel_run(hint_run)
@@ -0,0 +1,154 @@
+# Model clients that wrap another client. They are kept apart from ResponseCache and RequestScheduler,
+# so creating those doesn't import autogen before the first client is built
+from autogen_core.models import ChatCompletionClient, CreateResult, RequestUsage
+from .cache import ResponseCache
+from .scheduler import RequestScheduler, is_rate_limit_error
+
+class CachedChatCompletionClient(ChatCompletionClient):
+    """
+    Model client that answers repeated requests from a ResponseCache and sends the rest to another client.
+    It should only wrap deterministic clients (temperature 0), whose answers don't change for the same request.
+
+    Attributes:
+        client (ChatCompletionClient): The client used for the requests not found in the cache.
+        cache (ResponseCache): The cache of responses.
+        model (str): The model of the client, part of the key of the requests.
+    """
+    def __init__(self, client : ChatCompletionClient, cache : ResponseCache, model : str):
+        self.client = client
+        self.cache = cache
+        self.model = model
+
+    def _cached_result(self, key : str) -> CreateResult:
+        result = self.cache.get(key)
+        if result is None:
+            return None
+        result = CreateResult.model_validate_json(result)
+        result.cached = True
+        result.usage = RequestUsage(prompt_tokens=0, completion_tokens=0)
+        return result
+
+    def _store(self, key : str, result : CreateResult) -> None:
+        if result.finish_reason in ('stop', 'function_calls'):
+            self.cache.put(key, result.model_dump_json())
+
+    async def create(self, messages : list, *, tools : list = [], json_output = None, **kwargs) -> CreateResult:
+        key = self.cache.make_key(self.model, messages, tools, json_output)
+        result = self._cached_result(key)
+        if result is None:
+            result = await self.client.create(messages, tools=tools, json_output=json_output, **kwargs)
+            self._store(key, result)
+        return result
+
+    async def create_stream(self, messages : list, *, tools : list = [], json_output = None, **kwargs):
+        key = self.cache.make_key(self.model, messages, tools, json_output)
+        result = self._cached_result(key)
+        if result is not None:
+            if isinstance(result.content, str):
+                yield result.content
+            yield result
+            return
+        async for chunk in self.client.create_stream(messages, tools=tools, json_output=json_output, **kwargs):
+            if isinstance(chunk, CreateResult):
+                self._store(key, chunk)
+            yield chunk
+
+    async def close(self) -> None:
+        await self.client.close()
+
+    def actual_usage(self) -> RequestUsage:
+        return self.client.actual_usage()
+
+    def total_usage(self) -> RequestUsage:
+        return self.client.total_usage()
+
+    def count_tokens(self, messages : list, *, tools : list = []) -> int:
+        return self.client.count_tokens(messages, tools=tools)
+
+    def remaining_tokens(self, messages : list, *, tools : list = []) -> int:
+        return self.client.remaining_tokens(messages, tools=tools)
+
+    @property
+    def capabilities(self):
+        return self.client.model_info
+
+    @property
+    def model_info(self):
+        return self.client.model_info
+
+class ScheduledChatCompletionClient(ChatCompletionClient):
+    """
+    Model client that sends the requests of another client through a RequestScheduler.
+
+    Attributes:
+        client (ChatCompletionClient): The client that sends the requests.
+        scheduler (RequestScheduler): The scheduler shared by all the clients of the process.
+        model (str): The model of the client, part of the key of the coalesced requests.
+        coalesce (bool): Whether identical requests in flight share their response. Only for deterministic clients (temperature 0).
+    """
+    def __init__(self, client : ChatCompletionClient, scheduler : RequestScheduler, model : str, coalesce : bool = False):
+        self.client = client
+        self.scheduler = scheduler
+        self.model = model
+        self.coalesce = coalesce
+
+    def _estimate_tokens(self, messages : list, tools : list) -> int:
+        # The tokens are only counted when there is a limit of tokens per minute
+        if self.scheduler.tokens.per_minute is None:
+            return 0
+        return self.client.count_tokens(messages, tools=tools)
+
+    async def create(self, messages : list, *, tools : list = [], json_output = None, cancellation_token = None,
+                     **kwargs) -> CreateResult:
+        tokens = self._estimate_tokens(messages, tools)
+        if self.coalesce:
+            # The shared request is not cancelled with the token of a caller: the caller stops waiting,
+            # and the request is cancelled when no caller waits for it
+            request = lambda : self.client.create(messages, tools=tools, json_output=json_output, **kwargs)
+            key = ResponseCache.make_key(self.model, messages, tools, json_output)
+            return await self.scheduler.send_coalesced(key, request, tokens, cancellation_token)
+        request = lambda : self.client.create(messages, tools=tools, json_output=json_output,
+                                              cancellation_token=cancellation_token, **kwargs)
+        return await self.scheduler.send(request, tokens)
+
+    async def create_stream(self, messages : list, *, tools : list = [], json_output = None, **kwargs):
+        tokens = self._estimate_tokens(messages, tools)
+        for attempt in range(self.scheduler.max_retries + 1):
+            await self.scheduler.acquire(tokens)
+            self.scheduler.sent += 1
+            started = False
+            try:
+                async for chunk in self.client.create_stream(messages, tools=tools, json_output=json_output, **kwargs):
+                    started = True
+                    if isinstance(chunk, CreateResult) and chunk.usage is not None:
+                        self.scheduler.tokens.take(chunk.usage.prompt_tokens + chunk.usage.completion_tokens - tokens)
+                    yield chunk
+                return
+            except Exception as e:
+                # A stream can only be retried before its first chunk
+                if started or not is_rate_limit_error(e) or attempt == self.scheduler.max_retries:
+                    raise
+                await self.scheduler.backoff(attempt)
+
+    async def close(self) -> None:
+        await self.client.close()
+
+    def actual_usage(self) -> RequestUsage:
+        return self.client.actual_usage()
+
+    def total_usage(self) -> RequestUsage:
+        return self.client.total_usage()
+
+    def count_tokens(self, messages : list, *, tools : list = []) -> int:
+        return self.client.count_tokens(messages, tools=tools)
+
+    def remaining_tokens(self, messages : list, *, tools : list = []) -> int:
+        return self.client.remaining_tokens(messages, tools=tools)
+
+    @property
+    def capabilities(self):
+        return self.client.model_info
+
+    @property
+    def model_info(self):
+        return self.client.model_info
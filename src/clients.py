@@ -0,0 +1,85 @@
+import os
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from autogen_core.models import ChatCompletionClient
+    from .cache import ResponseCache
+    from .scheduler import RequestScheduler
+
+class ModelClientPool():
+    """
+    Shares the model clients used by the agents of a game.
+
+    There is one client for each model and temperature. Every client keeps its own HTTP connection pool,
+    so reusing them keeps the connections alive across cards and turns.
+
+    Attributes:
+        clients (dict): The created clients, indexed by (model, temperature).
+        client_factory (callable): Function (model, temperature) -> ChatCompletionClient used to create the clients.
+                                   None to create OpenAIChatCompletionClient instances.
+        cache (ResponseCache): Cache for the responses of the deterministic (temperature 0) clients. None to disable it.
+        scheduler (RequestScheduler): Scheduler that sends the requests of all the clients within the rate limits.
+                                      None to send them directly.
+    """
+    def __init__(self, client_factory = None, cache : "ResponseCache" = None, scheduler : "RequestScheduler" = None):
+        self.clients = {}
+        self._closed_usage = (0, 0)
+        self.client_factory = client_factory
+        self.cache = cache
+        self.scheduler = scheduler
+
+    def get(self, model : str, temperature : float = None) -> "ChatCompletionClient":
+        """
+        Returns the client for a model and temperature, creating it the first time it is requested.
+        The requests go through the scheduler, if there is one, and the deterministic clients (temperature 0)
+        answer repeated requests from the cache, if there is one, and share the response of identical requests in flight.
+
+        Args:
+            model (str): The OpenAI model used by the client.
+            temperature (float): The temperature of the completions. None to use the model default.
+
+        Returns (ChatCompletionClient): The shared client.
+        """
+        key = (model, temperature)
+        if key in self.clients:
+            return self.clients[key]
+        if self.client_factory is not None:
+            client = self.client_factory(model, temperature)
+        else:
+            # The OpenAI client is imported when the first client is created, so it doesn't slow down the start of the game
+            from autogen_ext.models.openai import OpenAIChatCompletionClient
+            kwargs = {} if temperature is None else {'temperature' : temperature}
+            client = OpenAIChatCompletionClient(model=model, api_key=os.environ['OPENAI_API_KEY'], **kwargs)
+        if self.scheduler is not None:
+            from .client_wrappers import ScheduledChatCompletionClient
+            client = ScheduledChatCompletionClient(client, self.scheduler, model, coalesce=temperature == 0)
+        if self.cache is not None and temperature == 0:
+            from .client_wrappers import CachedChatCompletionClient
+            client = CachedChatCompletionClient(client, self.cache, model)
+        self.clients[key] = client
+        return client
+
+    async def close(self) -> None:
+        """
+        Closes all the clients of the pool and their connections.
+        """
+        clients = list(self.clients.values())
+        # The usage of the closed clients is kept for total_usage
+        self._closed_usage = self.total_usage()
+        self.clients.clear()
+        for client in clients:
+            await client.close()
+
+    def total_usage(self) -> tuple:
+        """
+        Sums the tokens used by all the clients of the pool, including the closed ones.
+        The responses answered by the cache or shared with an identical request don't count.
+
+        Returns (tuple): The prompt tokens and the completion tokens.
+        """
+        prompt_tokens, completion_tokens = self._closed_usage
+        for client in self.clients.values():
+            usage = client.total_usage()
+            prompt_tokens += usage.prompt_tokens
+            completion_tokens += usage.completion_tokens
+        return prompt_tokens, completion_tokens
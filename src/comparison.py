@@ -0,0 +1,143 @@
+import asyncio
+import csv
+import json
+import random
+from .clients import ModelClientPool
+from .simulation import Simulation
+
+# Columns of the comparison table, in order
+COMPARISON_FIELDS = ['model', 'cards', 'success_rate', 'mean_tries', 'points', 'points_per_card', 'p50_time', 'p95_time',
+                     'wall_time', 'prompt_tokens', 'completion_tokens', 'cost']
+
+class ComparisonReport():
+    """
+    Results of a comparison of models over the same cards.
+
+    Attributes:
+        seed (int): Seed of the card sampling shared by all the models.
+        reports (dict): The SimulationReport of each model, indexed by model.
+        usage (dict): The prompt and completion tokens used by each model, indexed by model.
+        prices (dict): Price of the prompt and completion tokens of some models, in USD per million tokens, indexed by model.
+    """
+    def __init__(self, seed : int, reports : dict, usage : dict, prices : dict = None):
+        self.seed = seed
+        self.reports = reports
+        self.usage = usage
+        self.prices = prices or {}
+
+    def rows(self) -> list:
+        """
+        Builds the comparison table, with a row for each model.
+
+        Returns (list): The rows, as dicts with the keys of COMPARISON_FIELDS. The cost is None if the price of the model is not known.
+        """
+        rows = []
+        for model, report in self.reports.items():
+            prompt_tokens, completion_tokens = self.usage[model]
+            cost = None
+            if model in self.prices:
+                prompt_price, completion_price = self.prices[model]
+                cost = (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1e6
+            points = report.points()
+            rows.append({'model' : model, 'cards' : len(report.results), 'success_rate' : report.success_rate(),
+                         'mean_tries' : report.mean_tries(), 'points' : points,
+                         'points_per_card' : points / len(report.results) if report.results else 0.0,
+                         'p50_time' : report.time_percentile(0.5), 'p95_time' : report.time_percentile(0.95),
+                         'wall_time' : report.wall_time, 'prompt_tokens' : prompt_tokens,
+                         'completion_tokens' : completion_tokens, 'cost' : cost})
+        return rows
+
+    def summary(self) -> str:
+        """
+        Builds a printable table of the comparison.
+
+        Returns (str): The table.
+        """
+        lines = [f'COMPARACIÓN DE MODELOS (SEMILLA {self.seed})',
+                 f'{"MODELO":<20} {"CARTAS":>6} {"ACIERTOS":>8} {"INTENTOS":>8} {"PUNTOS":>6} {"P50":>7} {"P95":>7} '
+                 f'{"TOKENS ENTRADA":>14} {"TOKENS SALIDA":>13} {"COSTE":>9}']
+        for row in self.rows():
+            cost = f'${row["cost"]:.4f}' if row['cost'] is not None else '-'
+            lines.append(f'{row["model"]:<20} {row["cards"]:>6} {row["success_rate"]:>8.1%} {row["mean_tries"]:>8.2f} '
+                         f'{row["points"]:>6} {row["p50_time"]:>6.1f}s {row["p95_time"]:>6.1f}s '
+                         f'{row["prompt_tokens"]:>14} {row["completion_tokens"]:>13} {cost:>9}')
+        return '\n'.join(lines)
+
+    def to_csv(self, path : str) -> None:
+        """
+        Saves the comparison table in a csv file.
+
+        Args:
+            path (str): Path of the csv file.
+        """
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=COMPARISON_FIELDS)
+            writer.writeheader()
+            writer.writerows(self.rows())
+
+    def to_json(self, path : str) -> None:
+        """
+        Saves the comparison table and the result of each card played by each model in a JSON file.
+
+        Args:
+            path (str): Path of the JSON file.
+        """
+        data = {'seed' : self.seed, 'models' : self.rows(),
+                'results' : {model : report.results for model, report in self.reports.items()}}
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+
+class ModelComparison():
+    """
+    Plays the same sample of cards with several models at the same time, as CPU rounds, to compare their quality,
+    latency and cost.
+
+    Every model runs its own Simulation with its own model clients, so the tokens of each model are counted apart
+    and a slow model doesn't hold the rounds of the others. The response cache and the request scheduler are shared.
+
+    Attributes:
+        simulations (dict): The Simulation of each model, indexed by model.
+        seed (int): Seed of the card sampling shared by all the models.
+        prices (dict): Price of the prompt and completion tokens of some models, in USD per million tokens, indexed by model.
+    """
+    def __init__(self, cards_path : str, models : list, n_cards : int = None, repeats : int = 1, concurrency : int = 8,
+                 model_concurrency : dict = None, seed : int = None, client_factory = None, cache = None,
+                 scheduler = None, prices : dict = None, **simulation_options):
+        """
+        Initializes the comparison, sampling the same cards for every model.
+
+        Args:
+            cards_path (str): Path to the CSV file containing the cards csv.
+            models (list): The models to compare.
+            n_cards (int): Number of cards sampled from the deck. All the cards if None.
+            repeats (int): Number of times each sampled card is played by each model.
+            concurrency (int): Maximum number of rounds of each model played at the same time.
+            model_concurrency (dict): Maximum number of rounds played at the same time for some models, indexed by model.
+                                      The models not included use concurrency.
+            seed (int): Seed for the card sampling. A random seed if None, so the models still play the same cards.
+            client_factory (callable): Function (model, temperature) -> ChatCompletionClient used to create the clients.
+                                       None to create OpenAIChatCompletionClient instances.
+            cache (ResponseCache): Cache for the responses of the deterministic (temperature 0) clients. None to disable it.
+            scheduler (RequestScheduler): Scheduler that sends the requests of all the models within the rate limits.
+                                          None to send them directly.
+            prices (dict): Price of the prompt and completion tokens of some models, in USD per million tokens, indexed by model.
+            **simulation_options: Other arguments of the Simulation of each model (hint_validation, pipelined, memory...).
+        """
+        self.seed = random.randrange(2 ** 32) if seed is None else seed
+        self.prices = prices or {}
+        model_concurrency = model_concurrency or {}
+        self.simulations = {}
+        for model in models:
+            model_clients = ModelClientPool(client_factory=client_factory, cache=cache, scheduler=scheduler)
+            self.simulations[model] = Simulation(cards_path, model, n_cards, repeats, model_concurrency.get(model, concurrency),
+                                                 self.seed, model_clients=model_clients, label=model, **simulation_options)
+
+    async def run(self) -> ComparisonReport:
+        """
+        Plays the sampled cards with all the models at the same time, and closes their model clients at the end.
+
+        Returns (ComparisonReport): The results of the comparison.
+        """
+        reports = await asyncio.gather(*(simulation.run() for simulation in self.simulations.values()))
+        usage = {model : simulation.model_clients.total_usage() for model, simulation in self.simulations.items()}
+        return ComparisonReport(self.seed, dict(zip(self.simulations, reports)), usage, self.prices)
@@ -0,0 +1,67 @@
+import asyncio
+import contextvars
+
+# Function that writes the messages of the current game session. Every asyncio task has its own copy,
+# so concurrent games write to their own players. None to write to the standard output
+_writer = contextvars.ContextVar('writer', default=None)
+
+def set_writer(writer) -> None:
+    """
+    Sets the function that writes the messages of the game played in the current task. None to write to the standard output.
+
+    Args:
+        writer (callable): Function (text) -> None.
+    """
+    _writer.set(writer)
+
+def output(*values, sep : str = ' ', end : str = '\n', flush : bool = False) -> None:
+    """
+    Writes a message to the player of the current game session, as print does.
+
+    Args:
+        values: The values to write.
+        sep (str): Separator between the values.
+        end (str): Text written after the last value.
+        flush (bool): Whether the standard output is flushed, when there is no session writer.
+    """
+    writer = _writer.get()
+    if writer is None:
+        print(*values, sep=sep, end=end, flush=flush)
+    else:
+        writer(sep.join(str(value) for value in values) + end)
+
+class QueueInput():
+    """
+    Input of a player fed by another task (e.g. a network connection), through an asyncio queue.
+    Its read method is the input function of the Player agent.
+
+    Attributes:
+        queue (asyncio.Queue): The messages of the player not read yet.
+        show_prompt (bool): Whether the prompt is written with output before reading.
+    """
+    def __init__(self, show_prompt : bool = True):
+        self.queue = asyncio.Queue()
+        self.show_prompt = show_prompt
+
+    def put(self, message : str) -> None:
+        """
+        Adds a message of the player.
+
+        Args:
+            message (str): The message.
+        """
+        self.queue.put_nowait(message)
+
+    async def read(self, prompt : str = '', cancellation_token = None) -> str:
+        """
+        Waits for the next message of the player.
+
+        Args:
+            prompt (str): Text shown before reading.
+            cancellation_token (CancellationToken): Token of the agent run reading the message.
+
+        Returns (str): The message.
+        """
+        if self.show_prompt and prompt:
+            output(prompt, end='')
+        return await self.queue.get()
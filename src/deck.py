@@ -0,0 +1,258 @@
+import csv
+import json
+import os
+import random
+import sys
+from array import array
+from .evaluate_guess import register_compiled_lemmas, split_guess, word_lemma
+from .evaluate_hint import ForbiddenMatcher, register_compiled_tokens
+
+# Number of forbidden words of each card
+FORBIDDEN_PER_CARD = 5
+# Version of the compiled card store format. Stores with another version are ignored
+CARD_STORE_VERSION = 2
+# Extension of the compiled card store, saved next to the cards csv file
+CARD_STORE_EXTENSION = '.store'
+# Separator of the strings of the compiled card store, which can't appear in the words of a card
+CARD_STORE_SEPARATOR = '\0'
+
+class CardStore():
+    """
+    The cards of a cards csv file, stored by columns. It is read once and can be shared by any number of decks.
+
+    The store can be compiled into a binary file, which also keeps the normalized tokens of the forbidden words
+    and the lemma of the target word of each card, so they are not computed again when the cards are played.
+    The file has a JSON header line followed by the columns as raw blobs: the card IDs and the number of tokens
+    of each card as arrays, and the strings of each card (target, forbidden words, tokens, lemma) in UTF-8.
+
+    Attributes:
+        ids (array): The ID of each card.
+        targets (tuple): The target word of each card.
+        forbidden (tuple): The forbidden words of each card, as tuples.
+        tokens (tuple): The normalized tokens of the forbidden words and the target word of each card.
+                        None if the store was not compiled.
+        lemmas (dict): The normalized lemma of the target words (None if it is not a single noun or adjective),
+                       indexed by the normalized target word. None if the store was not compiled.
+    """
+    def __init__(self, ids : list, targets : list, forbidden : list, tokens : list = None, lemmas : dict = None):
+        self.ids = array('l', ids)
+        self.targets = tuple(targets)
+        self.forbidden = tuple(tuple(words) for words in forbidden)
+        self.tokens = tuple(tokens) if tokens is not None else None
+        self.lemmas = lemmas
+
+    @staticmethod
+    def store_path(cards_path : str) -> str:
+        """
+        Builds the default path of the compiled store of a cards csv file, next to it.
+
+        Args:
+            cards_path (str): Path to the cards csv file.
+
+        Returns (str): The path of the compiled store.
+        """
+        return os.path.splitext(cards_path)[0] + CARD_STORE_EXTENSION
+
+    @staticmethod
+    def _csv_signature(cards_path : str) -> tuple:
+        stat = os.stat(cards_path)
+        return (stat.st_size, stat.st_mtime_ns)
+
+    @classmethod
+    def compile(cls, cards_path : str, store_path : str = None) -> 'CardStore':
+        """
+        Reads the cards from a csv file, precomputes their tokens and lemmas and saves them in a binary store.
+
+        Args:
+            cards_path (str): Path to the cards csv file.
+            store_path (str): Path of the compiled store. Next to the csv file if None.
+
+        Returns (CardStore): The compiled cards.
+        """
+        cards = cls.from_csv(cards_path)
+        cards.tokens = tuple(ForbiddenMatcher.tokenize(list(words) + [target])
+                             for target, words in zip(cards.targets, cards.forbidden))
+        cards.lemmas = {' '.join(split_guess(target)) : word_lemma(split_guess(target)) for target in cards.targets}
+        cards.save(store_path or cls.store_path(cards_path), cls._csv_signature(cards_path))
+        return cards
+
+    def save(self, store_path : str, csv_signature : tuple) -> None:
+        """
+        Saves the compiled cards in a binary store. The file is written next to it and then moved into place,
+        so an interrupted compilation doesn't leave a broken store.
+
+        Args:
+            store_path (str): Path of the compiled store.
+            csv_signature (tuple): Size and modification time of the cards csv file, to detect a stale store.
+        """
+        strings = []
+        for target, words, tokens in zip(self.targets, self.forbidden, self.tokens):
+            lemma_key = ' '.join(split_guess(target))
+            strings.extend((target, *words, *tokens, lemma_key, self.lemmas.get(lemma_key) or ''))
+        blobs = {'ids' : array('q', self.ids).tobytes(),
+                 'token_counts' : array('I', (len(tokens) for tokens in self.tokens)).tobytes(),
+                 'strings' : CARD_STORE_SEPARATOR.join(strings).encode('utf-8')}
+        header = {'version' : CARD_STORE_VERSION, 'csv_signature' : list(csv_signature), 'cards' : len(self),
+                  'byteorder' : sys.byteorder, 'blobs' : {name : len(blob) for name, blob in blobs.items()}}
+        tmp_path = f'{store_path}.{os.getpid()}.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(json.dumps(header).encode('utf-8') + b'\n')
+                for blob in blobs.values():
+                    f.write(blob)
+            os.replace(tmp_path, store_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, cards_path : str, store_path : str = None) -> 'CardStore':
+        """
+        Loads the cards from their compiled store and registers its tokens and lemmas for the matchers.
+        If the store doesn't exist, is stale (the csv file changed after compiling it) or is broken,
+        the cards are read from the csv file.
+
+        Args:
+            cards_path (str): Path to the cards csv file.
+            store_path (str): Path of the compiled store. Next to the csv file if None.
+
+        Returns (CardStore): The cards.
+        """
+        store_path = store_path or cls.store_path(cards_path)
+        if not os.path.exists(store_path):
+            return cls.from_csv(cards_path)
+        try:
+            cards = cls._read_store(store_path, cls._csv_signature(cards_path))
+        except (EOFError, KeyError, ValueError, TypeError) as e:
+            print(f'El fichero {store_path} está dañado ({e}), se leen las cartas de {cards_path}')
+            return cls.from_csv(cards_path)
+        if cards is None:
+            print(f'El fichero {store_path} está desactualizado, se leen las cartas de {cards_path}')
+            return cls.from_csv(cards_path)
+        cards.register()
+        return cards
+
+    @classmethod
+    def _read_store(cls, store_path : str, csv_signature : tuple) -> 'CardStore':
+        with open(store_path, 'rb') as f:
+            header = json.loads(f.readline().decode('utf-8'))
+            if header['version'] != CARD_STORE_VERSION or tuple(header['csv_signature']) != csv_signature:
+                return None
+            blobs = {}
+            for name, size in header['blobs'].items():
+                blobs[name] = f.read(size)
+                if len(blobs[name]) != size:
+                    raise EOFError(f'the {name} column is truncated')
+        ids = array('q', blobs['ids'])
+        token_counts = array('I', blobs['token_counts'])
+        if header['byteorder'] != sys.byteorder:
+            ids.byteswap()
+            token_counts.byteswap()
+        strings = blobs['strings'].decode('utf-8').split(CARD_STORE_SEPARATOR)
+        n_cards = header['cards']
+        if len(ids) != n_cards or len(token_counts) != n_cards:
+            raise ValueError('the columns have a different number of cards')
+        if len(strings) != n_cards * (FORBIDDEN_PER_CARD + 3) + sum(token_counts):
+            raise ValueError('the number of strings does not match the cards')
+        targets, forbidden, tokens, lemmas = [], [], [], {}
+        pos = 0
+        for n_tokens in token_counts:
+            targets.append(strings[pos])
+            forbidden.append(strings[pos + 1 : pos + 1 + FORBIDDEN_PER_CARD])
+            pos += 1 + FORBIDDEN_PER_CARD
+            tokens.append(tuple(strings[pos : pos + n_tokens]))
+            pos += n_tokens
+            lemmas[strings[pos]] = strings[pos + 1] or None
+            pos += 2
+        return cls(ids, targets, forbidden, tokens, lemmas)
+
+    def register(self) -> None:
+        """
+        Registers the precomputed tokens and lemmas of the cards, so the matchers use them instead of computing them.
+        """
+        if self.tokens is None:
+            return
+        register_compiled_tokens({words + (target,) : tokens
+                                  for target, words, tokens in zip(self.targets, self.forbidden, self.tokens)})
+        register_compiled_lemmas(self.lemmas)
+
+    @classmethod
+    def from_csv(cls, cards_path : str) -> 'CardStore':
+        """
+        Reads the cards from a csv file with the columns ID, target and forbidden_1 to forbidden_5.
+
+        Args:
+            cards_path (str): Path to the cards csv file.
+
+        Returns (CardStore): The cards of the file.
+        """
+        with open(cards_path, encoding='utf-8', newline='') as f:
+            rows = list(csv.DictReader(f))
+        return cls([int(row['ID']) for row in rows], [row['target'] for row in rows],
+                   [[row[f'forbidden_{i}'] for i in range(1, FORBIDDEN_PER_CARD + 1)] for row in rows])
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def card(self, index : int) -> dict:
+        """
+        Builds the card at a position of the store.
+
+        Args:
+            index (int): The position of the card.
+
+        Returns (dict): The card, with the keys ID, target and forbidden_1 to forbidden_5.
+        """
+        card = {'ID' : self.ids[index], 'target' : self.targets[index]}
+        for i, word in enumerate(self.forbidden[index], 1):
+            card[f'forbidden_{i}'] = word
+        return card
+
+class Deck():
+    """
+    A shuffled deck of cards, drawn without repetition.
+
+    The deck is shuffled lazily (Fisher-Yates): every draw swaps a random remaining card to the end of the
+    undrawn part, so a draw and a reset are O(1). Each deck has its own order and random generator,
+    so several decks can share the same CardStore in concurrent games.
+
+    Attributes:
+        store (CardStore): The cards of the deck.
+        order (array): Permutation of the card positions. The drawn cards are at the end.
+        remaining (int): Number of cards left to draw.
+    """
+    def __init__(self, store : CardStore, seed : int = None):
+        """
+        Initializes the deck with all the cards of the store.
+
+        Args:
+            store (CardStore): The cards of the deck.
+            seed (int): Seed for the order of the cards.
+        """
+        self.store = store
+        self.order = array('l', range(len(store)))
+        self.remaining = len(store)
+        self._rng = random.Random(seed)
+
+    def __len__(self) -> int:
+        return self.remaining
+
+    def draw(self) -> dict:
+        """
+        Draws a random card that has not been drawn yet. When all the cards have been drawn, the deck is reset.
+
+        Returns (dict): The card, with the keys ID, target and forbidden_1 to forbidden_5.
+        """
+        if self.remaining == 0:
+            self.reset()
+        index = self._rng.randrange(self.remaining)
+        self.remaining -= 1
+        self.order[index], self.order[self.remaining] = self.order[self.remaining], self.order[index]
+        return self.store.card(self.order[self.remaining])
+
+    def reset(self) -> None:
+        """
+        Puts all the drawn cards back in the deck. Next draws are random again, so there is no need to reshuffle.
+        """
+        self.remaining = len(self.store)
@@ -0,0 +1,163 @@
+import csv
+import os
+from .evaluate_hint import get_spacy_nlp, get_tokenizer, normalize_word
+
+# Articles that can precede the guess without changing its meaning
+ARTICLES = frozenset({"el", "la", "los", "las", "un", "una", "unos", "unas"})
+# Parts of speech whose lemma is compared (verb lemmas would accept any conjugation as a hit)
+LEMMA_POS = frozenset({"NOUN", "PROPN", "ADJ"})
+# Separator of the synonyms in the synonyms csv file
+SYNONYMS_SEPARATOR = "|"
+
+# Lemmas of the target words of a compiled card store, indexed by the normalized word
+_compiled_lemmas = {}
+
+def load_synonyms(synonyms_path : str) -> dict:
+    """
+    Loads the synonyms of the cards from a csv file with the columns ID and synonyms.
+    The synonyms of a card are separated by '|'. The file is optional: if it doesn't exist, no synonyms are loaded.
+
+    Args:
+        synonyms_path (str): Path to the synonyms csv file.
+
+    Returns (dict): The synonyms of each card, indexed by the card ID.
+    """
+    if not os.path.exists(synonyms_path):
+        return {}
+    with open(synonyms_path, encoding='utf-8', newline='') as f:
+        return {
+            int(row['ID']): [synonym.strip() for synonym in row['synonyms'].split(SYNONYMS_SEPARATOR) if synonym.strip()]
+            for row in csv.DictReader(f)
+        }
+
+def register_compiled_lemmas(lemmas : dict) -> None:
+    """
+    Registers the lemmas precomputed by a compiled card store, so the Spacy pipeline is not run for its target words.
+
+    Args:
+        lemmas (dict): The normalized lemma of each word (None if it is not a single noun or adjective),
+                       indexed by the normalized word.
+    """
+    _compiled_lemmas.update(lemmas)
+
+def singularize(word : str) -> str:
+    """
+    Returns the singular form of a normalized spanish word, using the regular plural rules.
+
+    Args:
+        word (str): A normalized word (lower case, without accents).
+
+    Returns (str): The singular form of the word, or the same word if it doesn't look like a plural.
+    """
+    if len(word) > 4 and word.endswith('ces'):
+        return word[:-3] + 'z'
+    if len(word) > 4 and word.endswith('es') and word[-3] not in 'aeiou':
+        return word[:-2]
+    if len(word) > 3 and word.endswith('s'):
+        return word[:-1]
+    return word
+
+def split_guess(text : str) -> tuple:
+    """
+    Splits a guess into normalized words, dropping a leading article.
+
+    Args:
+        text (str): The guess or target word.
+
+    Returns (tuple): The normalized words of the text.
+    """
+    words = [normalize_word(word) for word in text.split()]
+    words = [word for word in words if word]
+    if len(words) > 1 and words[0] in ARTICLES:
+        words = words[1:]
+    return tuple(words)
+
+def word_lemma(words : tuple) -> str:
+    """
+    Returns the normalized lemma of a single noun or adjective.
+    With the rule-based tokenizer, only the lemmas of a compiled card store are known.
+
+    Args:
+        words (tuple): The normalized words of a text, as returned by split_guess.
+
+    Returns (str): The lemma, or None if the text is not a single noun or adjective or its lemma is not known.
+    """
+    if len(words) != 1:
+        return None
+    if words[0] in _compiled_lemmas:
+        return _compiled_lemmas[words[0]]
+    if get_tokenizer() != 'spacy':
+        return None
+    doc = get_spacy_nlp()(words[0])
+    if len(doc) != 1 or doc[0].pos_ not in LEMMA_POS:
+        return None
+    return normalize_word(doc[0].lemma_)
+
+class GuessMatcher():
+    """
+    Evaluates guesses locally, leaving only the ambiguous ones to the GuessEvaluator agent.
+
+    A guess is a hit if it is the target word or one of the synonyms of the card (ignoring accents, case and
+    a leading article), or if its singular or its lemma is. Only the guess is reduced: the plural rules and the lemmas
+    of Spacy would truncate singular targets ending in -s (PAIS -> 'pai', TENIS -> 'teni'), so the target words are
+    compared as written and the singular of a plural target is left to the GuessEvaluator.
+
+    The only misses solved locally are the guesses already evaluated for the card. Forbidden words can be true synonyms
+    of the target, and a single word can't be told unrelated without knowing its meaning, so any other guess is ambiguous.
+
+    Attributes:
+        target_word (str): The word to be guessed.
+        hits (set): The normalized target word and synonyms, as written.
+        verdicts (dict): Evaluations of previous guesses for the card, indexed by the normalized guess.
+    """
+    def __init__(self, target_word : str, synonyms : list = None):
+        self.target_word = target_word
+        self.hits = set()
+        for word in [target_word] + list(synonyms or []):
+            words = split_guess(word)
+            if words:
+                self.hits.add(' '.join(words))
+        self.verdicts = {}
+
+    @staticmethod
+    def _forms(words : tuple) -> set:
+        """
+        Returns the normalized forms of a guess: the words as written and their possible singular forms
+        (the plural rules, and the -s plural of the words ending in -e, as 'garajes').
+        """
+        return {' '.join(words), ' '.join(singularize(word) for word in words),
+                ' '.join(word[:-1] if len(word) > 3 and word.endswith('es') else word for word in words)}
+
+    def evaluate(self, guess : str) -> str:
+        """
+        Evaluates a guess locally.
+
+        Args:
+            guess (str): The guess to evaluate.
+
+        Returns (str): 'ACIERTO' if the guess is clearly right, the previous evaluation of a repeated guess,
+                       'NOK' for an empty guess and None if it is ambiguous.
+        """
+        words = split_guess(guess)
+        if not words:
+            return 'NOK'
+        key = ' '.join(words)
+        if key in self.verdicts:
+            return self.verdicts[key]
+        if self._forms(words) & self.hits:
+            return 'ACIERTO'
+        if word_lemma(words) in self.hits:
+            return 'ACIERTO'
+        return None
+
+    def record(self, guess : str, evaluation : str) -> None:
+        """
+        Remembers the evaluation given by the GuessEvaluator agent to an ambiguous guess.
+
+        Args:
+            guess (str): The evaluated guess.
+            evaluation (str): The evaluation of the guess.
+        """
+        words = split_guess(guess)
+        if words and evaluation in ('ACIERTO', 'NOK'):
+            self.verdicts[' '.join(words)] = evaluation
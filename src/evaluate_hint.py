@@ -1,42 +1,97 @@
 from functools import lru_cache
+from typing import Iterable, Iterator
+import threading
 import unicodedata
-import spacy
+from .stopwords import rule_main_words
+from .tracing import trace
 
-def lev_dist(a : str, b : str) -> int:
+SPACY_MODEL = "es_core_news_sm"
+# The dependency parser and the entity recognizer are not needed to get the part of speech of each token
+SPACY_DISABLED_COMPONENTS = ["parser", "ner"]
+# Parts of speech that are not considered main words of a hint
+FILTERED_POS = frozenset({"DET", "ADP", "CONJ", "SCONJ", "PUNCT", "AUX", "PRON", "ADV"})
+
+# Backends that extract the main words of the hints: the Spacy pipeline or the rule-based stop-word filter
+TOKENIZERS = ('spacy', 'rules')
+
+_tokenizer = 'spacy'
+_spacy_nlp = None
+_spacy_nlp_lock = threading.Lock()
+# Normalized tokens of the cards of a compiled card store, indexed by the forbidden words of the card (target word last)
+_compiled_tokens = {}
+
+def lev_dist(a : str, b : str, max_dist : int = None) -> int:
     '''
     This function will calculate the levenshtein distance between two input
-    strings a and b
+    strings a and b, iterating over the rows of the distance matrix.
     
     params:
         a (str) : The first string you want to compare
         b (str) : The second string you want to compare
+        max_dist (int) : If given, the calculation stops as soon as the distance
+                         is known to be larger than max_dist
         
-    returns (int): The distance between string a and b.
+    returns (int): The distance between string a and b, or max_dist + 1 if
+                   the distance is larger than max_dist.
         
     example:
         a = 'stamp'
         b = 'stomp'
         lev_dist(a,b)
-        >> 1.0
+        >> 1
     '''
-    
-    @lru_cache(None)  # for memorization
-    def min_dist(s1, s2):
-
-        if s1 == len(a) or s2 == len(b):
-            return len(a) - s1 + len(b) - s2
+    if len(a) < len(b):
+        a, b = b, a
+    if max_dist is not None and len(a) - len(b) > max_dist:
+        return max_dist + 1
+    previous = list(range(len(b) + 1))
+    current = [0] * (len(b) + 1)
+    for i in range(1, len(a) + 1):
+        current[0] = i
+        row_min = i
+        for j in range(1, len(b) + 1):
+            current[j] = min(
+                previous[j] + 1,                            # delete character
+                current[j - 1] + 1,                         # insert character
+                previous[j - 1] + (a[i - 1] != b[j - 1]),   # replace character
+            )
+            if current[j] < row_min:
+                row_min = current[j]
+        # The distance can't be lower than the minimum of any row
+        if max_dist is not None and row_min > max_dist:
+            return max_dist + 1
+        previous, current = current, previous
+    if max_dist is not None and previous[-1] > max_dist:
+        return max_dist + 1
+    return previous[-1]
 
-        # no change required
-        if a[s1] == b[s2]:
-            return min_dist(s1 + 1, s2 + 1)
+def lev_within(a : str, b : str, max_dist : int = 1) -> bool:
+    """
+    Checks if the levenshtein distance between two strings is at most max_dist.
+    The usual case max_dist = 1 is solved comparing the common prefix and suffix of both strings,
+    without building the distance matrix.
 
-        return 1 + min(
-            min_dist(s1, s2 + 1),      # insert character
-            min_dist(s1 + 1, s2),      # delete character
-            min_dist(s1 + 1, s2 + 1),  # replace character
-        )
+    Args:
+        a (str): The first string to compare.
+        b (str): The second string to compare.
+        max_dist (int): The maximum distance allowed.
 
-    return min_dist(0, 0)
+    Returns (bool): True if the distance between a and b is lower or equal than max_dist.
+    """
+    if max_dist != 1:
+        return lev_dist(a, b, max_dist) <= max_dist
+    if len(a) > len(b):
+        a, b = b, a
+    if len(b) - len(a) > 1:
+        return False
+    prefix = 0
+    while prefix < len(a) and a[prefix] == b[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < len(a) - prefix and a[-1 - suffix] == b[-1 - suffix]:
+        suffix += 1
+    # At most one character of the longer string is left out of the common prefix and suffix
+    return len(b) - prefix - suffix <= 1
 
 def remove_accents_and_non_alphanumeric(word: str) -> str:
     """
@@ -50,9 +105,67 @@ def remove_accents_and_non_alphanumeric(word: str) -> str:
         if unicodedata.category(char) != 'Mn' and char.isalnum()
     )
 
+def normalize_word(word : str) -> str:
+    """
+    Normalizes a word so it can be compared with other words: lower case, without accents or non-alphanumeric characters.
+
+    Args:
+        word (str): The word to normalize.
+
+    Returns (str): The normalized word.
+    """
+    return remove_accents_and_non_alphanumeric(word.lower())
+
+def set_tokenizer(tokenizer : str) -> None:
+    """
+    Sets the backend that extracts the main words of the hints for the whole process.
+    With 'rules', Spacy is never loaded: the guesses are only lemmatized with the lemmas of a compiled card store.
+
+    Args:
+        tokenizer (str): 'spacy' or 'rules'.
+    """
+    global _tokenizer
+    if tokenizer not in TOKENIZERS:
+        raise ValueError(f"Unknown tokenizer: {tokenizer}")
+    _tokenizer = tokenizer
+
+def get_tokenizer() -> str:
+    """
+    Returns the backend that extracts the main words of the hints: 'spacy' or 'rules'.
+    """
+    return _tokenizer
+
+def get_spacy_nlp():
+    """
+    Returns the Spacy pipeline for spanish language shared by the whole process.
+    The pipeline is loaded (and Spacy imported) the first time it is needed, with the components not used by the game disabled.
+
+    Returns (spacy.language.Language): The loaded Spacy pipeline.
+    """
+    global _spacy_nlp
+    if _spacy_nlp is None:
+        with _spacy_nlp_lock:
+            if _spacy_nlp is None:
+                import spacy
+                _spacy_nlp = spacy.load(SPACY_MODEL, disable=SPACY_DISABLED_COMPONENTS)
+    return _spacy_nlp
+
+def warm_up_spacy() -> threading.Thread:
+    """
+    Loads the Spacy pipeline in a background thread, so it is ready when the first hint is checked.
+
+    Returns (threading.Thread): The thread loading the pipeline, or None if the rule-based tokenizer is used.
+    """
+    if _tokenizer != 'spacy':
+        return None
+    thread = threading.Thread(target=get_spacy_nlp, name='spacy-warm-up', daemon=True)
+    thread.start()
+    return thread
+
 def extract_main_words(sentence : str) -> list:
     """
-    Extracts the main words from a sentence by filtering out less significant parts of speech using Spacy model for spanish language.
+    Extracts the main words from a sentence by filtering out less significant parts of speech using Spacy model for spanish language,
+    or the Spanish function words if the rule-based tokenizer is used.
     
     Args:
         sentence (str): The input sentence from which main words are extracted.
@@ -60,12 +173,48 @@ def extract_main_words(sentence : str) -> list:
     Returns (list): A list of main words from the sentence, excluding determiners, prepositions, conjunctions, 
               auxiliary verbs, pronouns, adverbs, punctuation, and similar tokens.
     """
-    spacy_nlp = spacy.load("es_core_news_sm")
-    doc = spacy_nlp(sentence)
+    if _tokenizer == 'rules':
+        return rule_main_words(sentence)
+    return doc_main_words(get_spacy_nlp()(sentence))
+
+def doc_main_words(doc) -> list:
+    """
+    Extracts the main words from a sentence already processed by the Spacy pipeline.
+
+    Args:
+        doc (spacy.tokens.Doc): The processed sentence.
+
+    Returns (list): A list of main words from the sentence.
+    """
     # Filter main words
-    main_words = [token.text for token in doc if token.pos_ not in {"DET", "ADP", "CONJ", "SCONJ", "PUNCT", "AUX", "PRON", "ADV"}]
+    main_words = [token.text for token in doc if token.pos_ not in FILTERED_POS]
     return main_words
 
+def compare_tokenizers(batch : Iterable) -> dict:
+    """
+    Compares the rule-based tokenizer with the Spacy pipeline on a corpus of hints.
+
+    Args:
+        batch (Iterable): Pairs (forbidden_words, hint), as the arguments of `evaluate_hint`.
+
+    Returns (dict): The number of hints, of hints with the same main words (same_words) and with the same
+                    evaluation (same_evaluation) with both backends, and the hint, Spacy words and rule words
+                    of each hint with different main words (differences).
+    """
+    pairs = list(batch)
+    report = {'hints' : len(pairs), 'same_words' : 0, 'same_evaluation' : 0, 'differences' : []}
+    for (forbidden_words, hint), doc in zip(pairs, get_spacy_nlp().pipe(hint for _, hint in pairs)):
+        spacy_words = doc_main_words(doc)
+        rule_words = rule_main_words(hint)
+        matcher = get_forbidden_matcher(tuple(forbidden_words))
+        if spacy_words == rule_words:
+            report['same_words'] += 1
+        else:
+            report['differences'].append((hint, spacy_words, rule_words))
+        if matcher.evaluate_words(spacy_words) == matcher.evaluate_words(rule_words):
+            report['same_evaluation'] += 1
+    return report
+
 def is_contained(w1 : str, w2 : str) -> bool:
     """
     Checks if one word is contained within another based on specific length and substring rules.
@@ -94,6 +243,111 @@ def is_contained(w1 : str, w2 : str) -> bool:
     else:
         return False
     
+class ForbiddenMatcher():
+    """
+    Checks words and hints against the forbidden words of a card.
+
+    The forbidden words are split (in case a forbidden word is a compound word) and normalized
+    only once, when the matcher is built, so they can be compared with every hint given for the card.
+
+    Attributes:
+        forbidden_words (list): The forbidden words as they appear in the card, including the target word.
+        tokens (tuple): The normalized single words obtained from the forbidden words.
+    """
+    def __init__(self, forbidden_words : list):
+        self.forbidden_words = list(forbidden_words)
+        self.tokens = _compiled_tokens.get(tuple(self.forbidden_words)) or self.tokenize(self.forbidden_words)
+
+    @staticmethod
+    def tokenize(forbidden_words : list) -> tuple:
+        """
+        Splits the forbidden words into single words and normalizes them, without repetitions.
+
+        Args:
+            forbidden_words (list): The forbidden words.
+
+        Returns (tuple): The normalized tokens.
+        """
+        return tuple(dict.fromkeys(normalize_word(word) for fw in forbidden_words for word in fw.split(' ')))
+
+    @classmethod
+    def from_card(cls, target_word : str, forbidden : list) -> "ForbiddenMatcher":
+        """
+        Builds the matcher for a card, forbidding both the forbidden words and the target word.
+
+        Args:
+            target_word (str): The target word of the card.
+            forbidden (list): The forbidden words of the card.
+
+        Returns (ForbiddenMatcher): The matcher for the card.
+        """
+        return cls(list(forbidden) + [target_word])
+
+    def is_forbidden(self, word : str) -> bool:
+        """
+        Checks if a single word is contained in or too similar to any of the forbidden words.
+
+        Args:
+            word (str): The word to check.
+
+        Returns (bool): True if the word can't be used in a hint.
+        """
+        word = normalize_word(word)
+        for token in self.tokens:
+            # Evaluates if one word is contained in the other
+            if is_contained(token, word):
+                return True
+            # Evaluates similarity using Levenshtein distance
+            if lev_within(token, word, 1):
+                return True
+        return False
+
+    def evaluate(self, hint : str) -> str:
+        """
+        Evaluates whether a hint contains forbidden words or similar terms.
+
+        Args:
+            hint (str): The hint to be evaluated.
+
+        Returns (str): 'PISTA PROHIBIDA' if any main word of the hint is forbidden, otherwise 'OK'.
+        """
+        return self.evaluate_words(extract_main_words(hint))
+
+    def evaluate_words(self, main_words : list) -> str:
+        """
+        Evaluates whether the main words of a hint contain forbidden words or similar terms.
+
+        Args:
+            main_words (list): The main words of the hint.
+
+        Returns (str): 'PISTA PROHIBIDA' if any of the words is forbidden, otherwise 'OK'.
+        """
+        for hmw in main_words:
+            if self.is_forbidden(hmw):
+                return 'PISTA PROHIBIDA'
+        return 'OK'
+
+def register_compiled_tokens(tokens : dict) -> None:
+    """
+    Registers the tokens precomputed by a compiled card store, so the matchers of its cards don't normalize them again.
+
+    Args:
+        tokens (dict): The normalized tokens of each card, indexed by the tuple of its forbidden words and target word.
+    """
+    _compiled_tokens.update(tokens)
+
+@lru_cache(maxsize=256)
+def get_forbidden_matcher(forbidden_words : tuple) -> ForbiddenMatcher:
+    """
+    Returns the matcher for a list of forbidden words, reusing it while the same card is being played.
+
+    Args:
+        forbidden_words (tuple): The forbidden words, including the target word.
+
+    Returns (ForbiddenMatcher): The matcher for the forbidden words.
+    """
+    return ForbiddenMatcher(list(forbidden_words))
+
 def evaluate_hint(forbidden_words : list, hint : str) -> str:
     """
     Evaluates whether a hint violates the rules by containing forbidden words or similar terms.
@@ -106,18 +360,26 @@ def evaluate_hint(forbidden_words : list, hint : str) -> str:
         str: Returns 'PISTA PROHIBIDA' if the hint contains or closely resembles any forbidden word,
              otherwise returns 'OK'.
     """
-    hint_main_words = extract_main_words(hint)
-    for fw in forbidden_words:
-        for word in fw.split(' '): # just in case a forbidden word is a compound word 
-            word = word.lower()
-            word = remove_accents_and_non_alphanumeric(word)
-            for hmw in hint_main_words:
-                hmw = hmw.lower()
-                hmw = remove_accents_and_non_alphanumeric(hmw)
-                # Evaluates if one word is contained in the other
-                if is_contained(word,hmw):
-                    return 'PISTA PROHIBIDA'
-                # Evaluates similarity using Levenshtein distance
-                elif lev_dist(word, hmw) <= 1:
-                    return 'PISTA PROHIBIDA'
-    return 'OK' 
\ No newline at end of file
+    with trace('tool', 'evaluate_hint'):
+        return get_forbidden_matcher(tuple(forbidden_words)).evaluate(hint)
+
+def evaluate_hints(batch : Iterable, batch_size : int = 64, n_process : int = 1) -> Iterator:
+    """
+    Evaluates many hints, processing them with the Spacy pipeline in batches (or one by one with the rule-based tokenizer).
+    The hints are read from the batch and the evaluations are yielded as they are computed, in the same order,
+    so large validation jobs don't need to keep all the hints in memory.
+
+    Args:
+        batch (Iterable): Pairs (forbidden_words, hint), as the arguments of `evaluate_hint`.
+        batch_size (int): Number of hints processed together by the Spacy pipeline.
+        n_process (int): Number of processes used by the Spacy pipeline. Use -1 for one process per CPU.
+
+    Yields (str): 'PISTA PROHIBIDA' or 'OK' for each hint of the batch.
+    """
+    if _tokenizer == 'rules':
+        for forbidden_words, hint in batch:
+            yield get_forbidden_matcher(tuple(forbidden_words)).evaluate_words(rule_main_words(hint))
+        return
+    hints = ((hint, forbidden_words) for forbidden_words, hint in batch)
+    for doc, forbidden_words in get_spacy_nlp().pipe(hints, as_tuples=True, batch_size=batch_size, n_process=n_process):
+        yield get_forbidden_matcher(tuple(forbidden_words)).evaluate_words(doc_main_words(doc))
@@ -1,7 +1,30 @@
+import asyncio
+import importlib
+import os
 import random
-import pandas as pd
+import threading
 from .utils import CircularBuffer
-from .chats import PlayerHintChat, PlayerGuessChat, CpuChat
+from .clients import ModelClientPool
+from .console import output
+from .deck import CardStore, Deck
+from .evaluate_guess import load_synonyms
+from .evaluate_hint import warm_up_spacy
+from .hint_bank import HintBank
+from .tracing import set_trace_context, trace
+
+def score_for_tries(tries : int) -> int:
+    """
+    Calculates the points of a guessed card based on the number of attempts.
+
+    Args:
+        tries (int): Number of attempts made.
+
+    Returns (int): The points of the card.
+    """
+    # 5 points if tries = 1, one point less for each extra try, 1 point if tries > 5
+    if tries <= 5:
+        return 5 - (tries - 1)
+    return 1
 
 class Game():
     """
@@ -11,29 +34,67 @@ class Game():
         player_score (int): Player's score.
         cpu_score (int): CPU's score.
         turns_order (CircularBuffer): Order of turns in the game.
-        cards_df (pd.DataFrame): DataFrame containing the game cards.
+        deck (Deck): The shuffled deck of the game cards.
         model (str): Model used for llm calls.
         rounds (int): Number of rounds in the game.
         cards_per_turn (int): Number of cards used per turn.
+        hint_validation (str): How hints are validated: 'local' (in process) or 'llm' (HintEvaluator agent).
+        pipelined (bool): Whether the agents of the CPU turns run overlapped.
+        streaming (bool): Whether the AI hints are streamed, aborting and regenerating the ones that use forbidden words.
+        memory (str): What the hint and guess generators remember of the previous tries of a card: 'full', 'window' or 'summary'.
+        hint_bank (HintBank): Hints generated in advance for the cards, given by the AI before generating new ones. None to generate all the hints.
+        synonyms (dict): Synonyms accepted as hits for some cards, indexed by card ID.
+        model_clients (ModelClientPool): Model clients shared by all the chats of the game.
+        chats (dict): The two chats of each turn type, reused for all the cards of the game. They are used alternately,
+                      so the next card can be prepared while the current one is played.
+        input_func (callable): The function used to read the player's messages.
     """
-    def __init__(self, cards_path : str, model : str, rounds : int, cards_per_turn : int):
+    def __init__(self, cards_path : str, model : str, rounds : int, cards_per_turn : int, hint_validation : str = 'local',
+                 model_clients : ModelClientPool = None, input_func = input, card_store : CardStore = None,
+                 seed : int = None, pipelined : bool = False, streaming : bool = False, memory : str = 'full',
+                 hint_bank : HintBank = None):
         """
         Initializes the game instance with the given parameters.
 
         Args:
-            cards_path (str): Path to the CSV file containing the cards csv.
+            cards_path (str): Path to the CSV file containing the cards csv. The synonyms of the cards are loaded
+                              from the synonyms.csv file in the same folder, if it exists.
             model (str): Model to be used for llm calls.
             rounds (int): Number of rounds in the game.
             cards_per_turn (int): Number of cards per turn.
+            hint_validation (str): How hints are validated: 'local' (in process) or 'llm' (HintEvaluator agent).
+            model_clients (ModelClientPool): Model clients for the game. A new pool of OpenAI clients if None.
+            input_func (callable): The function used to read the player's messages.
+            card_store (CardStore): Cards already loaded, shared with other games. Loaded from cards_path
+                                    (or its compiled store) if None.
+            seed (int): Seed for the order of the cards.
+            pipelined (bool): Whether the agents of the CPU turns run overlapped, generating the guess while the hint
+                              is validated and the next hint while the guess is evaluated.
+            streaming (bool): Whether the AI hints are printed as they are generated. A hint is aborted and generated
+                              again as soon as it uses a forbidden word.
+            memory (str): What the hint and guess generators remember of the previous tries of a card: the whole
+                          conversation ('full'), the last tries ('window') or a summary of the previous hints and guesses ('summary').
+            hint_bank (HintBank): Hints generated in advance for the cards, given by the AI before generating new ones.
+                                  None to generate all the hints.
         """
         self.player_score = 0
         self.cpu_score = 0
         self.turns_order = None
-        self.cards_df = pd.read_csv(cards_path)
-        self.cards_df['discarded'] = False
+        self.deck = Deck(card_store or CardStore.load(cards_path), seed)
         self.model = model
         self.rounds = rounds
         self.cards_per_turn = cards_per_turn
+        self.hint_validation = hint_validation
+        self.pipelined = pipelined
+        self.streaming = streaming
+        self.memory = memory
+        self.hint_bank = hint_bank
+        self.synonyms = load_synonyms(os.path.join(os.path.dirname(cards_path), 'synonyms.csv'))
+        self.model_clients = model_clients or ModelClientPool()
+        self.input_func = input_func
+        self.chats = {}
+        # The task preparing the card the game is waiting for, whose requests are not background traffic
+        self._awaited_task = None
     
     def add_score(self, turn_type : str, tries : int) -> int:
         """
@@ -45,11 +106,7 @@ class Game():
 
         Returns (int): Score added.
         """
-        # Add 5 points if tries = 1, substract number of tries if tries > 1, add 1 point if tries >= 5
-        if tries <= 5:
-            score_to_add = 5 - (tries - 1)
-        else:
-            score_to_add = 1
+        score_to_add = score_for_tries(tries)
         if 'player' in turn_type:
             self.player_score += score_to_add
         else:
@@ -78,23 +135,74 @@ class Game():
 
     def get_random_card(self) -> dict:
         """
-        Retrieves a random, non-discarded card and marks it as discarded.
+        Draws a random card that has not been played yet in the game.
 
         Returns (dict): The selected card with its attributes.
         """
-        random_card = self.cards_df.loc[self.cards_df['discarded'] == False].sample(n = 1).to_dict(orient='records')[0]
-        id_ = random_card['ID']
-        self.cards_df.loc[self.cards_df['ID'] == id_ , 'discarded'] = True
-        return random_card
+        with trace('deck', 'get_random_card'):
+            return self.deck.draw()
     
+    async def get_chat(self, turn_type : str, forbidden : list, target_word : str, synonyms : list = None, hints : list = None):
+        """
+        Returns the chat for a turn type, targeted to the given card.
+        There are two chats for each turn type, used alternately: each is created the first time and re-targeted
+        for the following cards, so their agents are reused and the chat of the card being played is never re-targeted.
+
+        Args:
+            turn_type (str): Type of turn ('player_hint_turn', 'player_guess_turn' or 'cpu').
+            forbidden (list): The forbidden words of the card.
+            target_word (str): The target word of the card.
+            synonyms (list): Words accepted as hits besides the target word.
+            hints (list): The hints of the card in the hint bank, given by the AI turns before generating new ones.
+
+        Returns (PlayerHintChat | PlayerGuessChat | CpuChat): The chat for the card.
+        """
+        # The agents (and autogen) are imported when the first chat is needed, usually by the warm_up thread
+        from .chats import PlayerHintChat, PlayerGuessChat, CpuChat
+        chats = self.chats.setdefault(turn_type, [])
+        if len(chats) == 2:
+            chat = chats.pop(0)
+            chats.append(chat)
+            if turn_type == 'player_hint_turn':
+                await chat.set_card(forbidden, target_word, synonyms)
+            else:
+                await chat.set_card(forbidden, target_word, synonyms, hints)
+            return chat
+        if turn_type == 'cpu':
+            chat = CpuChat(self.model_clients, self.model, forbidden, target_word, self.hint_validation, synonyms,
+                           pipelined=self.pipelined, streaming=self.streaming, memory=self.memory, hints=hints)
+        elif turn_type == 'player_guess_turn':
+            chat = PlayerGuessChat(self.model_clients, self.model, forbidden, target_word, self.hint_validation, synonyms,
+                                   self.input_func, self.streaming, self.memory, hints)
+        else:
+            chat = PlayerHintChat(self.model_clients, self.model, forbidden, target_word, self.hint_validation, synonyms,
+                                  self.input_func, self.memory)
+        chats.append(chat)
+        return chat
+
     async def start_game(self) -> str:
         """
-        Starts the game, managing rounds and turns.
+        Starts the game and closes the model clients when it ends.
 
         Returns (str): Final game results with the scores.
         """
-        turns_order_list = self.roll_turn_order()
-        self.turns_order = CircularBuffer(turns_order_list)
+        self.warm_up()
+        try:
+            return await self.play_rounds()
+        finally:
+            await self.model_clients.close()
+
+    def warm_up(self) -> None:
+        """
+        Imports the agents and loads the Spacy pipeline in background threads, while the first card is shown.
+        """
+        warm_up_spacy()
+        threading.Thread(target=importlib.import_module, args=('.chats', __package__), name='agents-warm-up', daemon=True).start()
+
+    def card_turns(self):
+        """
+        Yields the turn type of every card of the game, in the order they are played.
+        """
         turns = 4 # Each round consist on 4 turns (2 turns for player, 2 turns for CPU) 
         ### Round
         for r in range(self.rounds):
@@ -102,35 +210,103 @@ class Game():
             for t in range(turns):
                 turn_type = self.turns_order.next()
                 ### Cards
-                for r in range(self.cards_per_turn):
-                    card = self.get_random_card()
-                    forbidden = [card['forbidden_1'], card['forbidden_2'], card['forbidden_3'], card['forbidden_4'], card['forbidden_5']]
-                    target_word = card['target']
-                    if turn_type == 'player_hint_turn':
-                        print('EL JUGADOR DA PISTAS')
-                        print(f'PALABRA : {target_word}')
-                        print(f'PALABRAS PROHIBIDAS : {", ".join(forbidden)}')
-                        game_round = PlayerHintChat(self.model, forbidden, target_word)
-                    elif turn_type == 'player_guess_turn':
-                        print('EL JUGADOR ADIVINA')
-                        game_round = PlayerGuessChat(self.model, forbidden, target_word)
-                    elif turn_type == 'cpu':
-                        print('JUEGA LA CPU')
-                        print(f'PALABRA : {target_word}')
-                        print(f'PALABRAS PROHIBIDAS : {", ".join(forbidden)}')
-                        game_round = CpuChat(self.model, forbidden, target_word)
-                    chat_result, tries = await game_round.initiate_round()
-                    if chat_result == 'ACIERTO':
-                        score_to_add = self.add_score(turn_type, tries)
-                        print(f'¡ACIERTO! SE SUMAN {score_to_add} PUNTOS.\n')
-                    elif chat_result == 'PASO':
-                        print(f'La palabra era {target_word}')
-                    elif chat_result == 'SALIR':
-                        return f'HAS SALIDO DEL JUEGO\nRESULTADOS : \n JUGADOR : {self.player_score} \n CPU : {self.cpu_score}'
-                    elif chat_result == 'PISTA PROHIBIDA':
-                        print('PISTA PROHIBIDA. NO SE SUMARÁN PUNTOS PARA ESTA CARTA.\n')
-                    elif chat_result == 'MÁXIMO DE INTENTOS ALCANZADO':
-                        print(f'La palabra era {target_word}')
-                        print('MÁXIMO DE INTENTOS ALCANZADO. NO SE SUMARÁN PUNTOS PARA ESTA CARTA.\n')
-                        
-        return f'RESULTADOS : \n JUGADOR : {self.player_score} \n CPU : {self.cpu_score}'
\ No newline at end of file
+                for c in range(self.cards_per_turn):
+                    yield turn_type
+
+    async def prepare_card(self, turn_type : str, card : dict, lookahead : bool = True):
+        """
+        Gets the chat of a card ready. For the player guess turns, the first hint is also generated and validated.
+        Nothing is printed, so the card can be prepared in the background while the previous one is played.
+
+        Args:
+            turn_type (str): Type of turn of the card.
+            card (dict): The card.
+            lookahead (bool): Whether the card is prepared while another one is played. Its model requests wait
+                              behind the requests of the card being played until the game waits for it.
+
+        Returns (PlayerHintChat | PlayerGuessChat | CpuChat): The chat for the card.
+        """
+        # The events of the preparation are traced with the prepared card, not with the card being played
+        set_trace_context(card=card['ID'], turn=turn_type, try_number=1)
+        if lookahead:
+            from .scheduler import BACKGROUND, INTERACTIVE, set_priority
+            task = asyncio.current_task()
+            set_priority(lambda : INTERACTIVE if self._awaited_task is task else BACKGROUND)
+        forbidden = [card['forbidden_1'], card['forbidden_2'], card['forbidden_3'], card['forbidden_4'], card['forbidden_5']]
+        hints = self.hint_bank.get(card['ID']) if self.hint_bank is not None else None
+        chat = await self.get_chat(turn_type, forbidden, card['target'], self.synonyms.get(card['ID']), hints)
+        if turn_type == 'player_guess_turn':
+            await chat.prefetch_hint()
+        return chat
+
+    def prefetch_card(self, card_turns, lookahead : bool = True) -> tuple:
+        """
+        Draws the next card of the game and starts preparing its chat in the background.
+
+        Args:
+            card_turns (generator): The turn types of the cards left, as yielded by card_turns.
+            lookahead (bool): Whether the card is prepared while another one is played (see prepare_card).
+
+        Returns (tuple): The turn type, the card and the task preparing its chat, or None if there are no cards left.
+        """
+        turn_type = next(card_turns, None)
+        if turn_type is None:
+            return None
+        card = self.get_random_card()
+        return turn_type, card, asyncio.create_task(self.prepare_card(turn_type, card, lookahead))
+
+    async def play_rounds(self) -> str:
+        """
+        Plays the rounds of the game, managing turns and cards.
+        While a card is played (mostly waiting for the player), the next card is prepared in the background.
+
+        Returns (str): Final game results with the scores.
+        """
+        turns_order_list = self.roll_turn_order()
+        self.turns_order = CircularBuffer(turns_order_list)
+        card_turns = self.card_turns()
+        # The first card is played as soon as it is ready
+        next_card = self.prefetch_card(card_turns, lookahead=False)
+        try:
+            while next_card is not None:
+                turn_type, card, chat_task = next_card
+                set_trace_context(card=card['ID'], turn=turn_type)
+                forbidden = [card['forbidden_1'], card['forbidden_2'], card['forbidden_3'], card['forbidden_4'], card['forbidden_5']]
+                target_word = card['target']
+                if turn_type == 'player_hint_turn':
+                    output('EL JUGADOR DA PISTAS')
+                    output(f'PALABRA : {target_word}')
+                    output(f'PALABRAS PROHIBIDAS : {", ".join(forbidden)}')
+                elif turn_type == 'player_guess_turn':
+                    output('EL JUGADOR ADIVINA')
+                elif turn_type == 'cpu':
+                    output('JUEGA LA CPU')
+                    output(f'PALABRA : {target_word}')
+                    output(f'PALABRAS PROHIBIDAS : {", ".join(forbidden)}')
+                self._awaited_task = chat_task
+                game_round = await chat_task
+                next_card = self.prefetch_card(card_turns)
+                chat_result, tries = await game_round.initiate_round()
+                if chat_result == 'ACIERTO':
+                    score_to_add = self.add_score(turn_type, tries)
+                    output(f'¡ACIERTO! SE SUMAN {score_to_add} PUNTOS.\n')
+                elif chat_result == 'PASO':
+                    output(f'La palabra era {target_word}')
+                elif chat_result == 'SALIR':
+                    return f'HAS SALIDO DEL JUEGO\nRESULTADOS : \n JUGADOR : {self.player_score} \n CPU : {self.cpu_score}'
+                elif chat_result == 'PISTA PROHIBIDA':
+                    output('PISTA PROHIBIDA. NO SE SUMARÁN PUNTOS PARA ESTA CARTA.\n')
+                elif chat_result == 'MÁXIMO DE INTENTOS ALCANZADO':
+                    output(f'La palabra era {target_word}')
+                    output('MÁXIMO DE INTENTOS ALCANZADO. NO SE SUMARÁN PUNTOS PARA ESTA CARTA.\n')
+        finally:
+            # The card being prepared is not played (the player left or a round failed)
+            if next_card is not None:
+                chat_task = next_card[2]
+                chat_task.cancel()
+                try:
+                    await chat_task
+                except (asyncio.CancelledError, Exception):
+                    pass
+
+        return f'RESULTADOS : \n JUGADOR : {self.player_score} \n CPU : {self.cpu_score}'
@@ -0,0 +1,154 @@
+import asyncio
+import csv
+import gzip
+import json
+from .clients import ModelClientPool
+from .deck import FORBIDDEN_PER_CARD, CardStore
+
+class HintBank():
+    """
+    Hints generated and validated in advance for the cards of a deck, in the order they are given.
+    The AI turns serve the hints of the bank instead of generating them, and generate new hints when a card runs out.
+
+    The bank is saved as gzipped JSON, with the hints indexed by card ID.
+
+    Attributes:
+        hints (dict): The hints of each card, indexed by card ID.
+        model (str): The model that generated the hints.
+    """
+    def __init__(self, hints : dict = None, model : str = None):
+        self.hints = hints or {}
+        self.model = model
+
+    def __len__(self) -> int:
+        return len(self.hints)
+
+    def get(self, card_id : int) -> list:
+        """
+        Returns the hints of a card.
+
+        Args:
+            card_id (int): The ID of the card.
+
+        Returns (list): A copy of the hints of the card, in the order they are given. Empty if the card is not in the bank.
+        """
+        return list(self.hints.get(card_id, ()))
+
+    def save(self, path : str) -> None:
+        """
+        Saves the bank as gzipped JSON.
+
+        Args:
+            path (str): Path of the bank file.
+        """
+        data = {'model' : self.model, 'hints' : {str(card_id) : hints for card_id, hints in self.hints.items()}}
+        with gzip.open(path, 'wt', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+
+    @classmethod
+    def load(cls, path : str) -> 'HintBank':
+        """
+        Loads a bank saved with save.
+
+        Args:
+            path (str): Path of the bank file.
+
+        Returns (HintBank): The bank.
+        """
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            data = json.load(f)
+        return cls({int(card_id) : hints for card_id, hints in data['hints'].items()}, data.get('model'))
+
+    @classmethod
+    async def build(cls, card_store : CardStore, model : str, model_clients : ModelClientPool = None,
+                    hints_per_card : int = 5, concurrency : int = 8, n_cards : int = None) -> 'HintBank':
+        """
+        Generates and validates the hints of the cards concurrently, and closes the model clients at the end.
+        The hints of each card are generated in the same conversation, so they don't repeat each other.
+        Forbidden hints are discarded, and each card gets at most twice hints_per_card requests.
+
+        Args:
+            card_store (CardStore): The cards.
+            model (str): Model used to generate the hints.
+            model_clients (ModelClientPool): Model clients for the generation. A new pool of OpenAI clients if None.
+            hints_per_card (int): Number of valid hints kept for each card.
+            concurrency (int): Maximum number of cards generated at the same time.
+            n_cards (int): Number of cards of the store included in the bank, from the first one. All the cards if None.
+
+        Returns (HintBank): The bank.
+        """
+        model_clients = model_clients or ModelClientPool()
+        cards = asyncio.Queue()
+        for index in range(len(card_store) if n_cards is None else min(n_cards, len(card_store))):
+            cards.put_nowait(card_store.card(index))
+        total = cards.qsize()
+        bank = cls(model=model)
+        try:
+            await asyncio.gather(*(bank.worker(cards, total, model_clients, hints_per_card) for _ in range(concurrency)))
+        finally:
+            await model_clients.close()
+        return bank
+
+    async def worker(self, cards : asyncio.Queue, total : int, model_clients : ModelClientPool, hints_per_card : int) -> None:
+        """
+        Generates the hints of the cards of the queue until it is empty.
+
+        Args:
+            cards (asyncio.Queue): The cards left to generate.
+            total (int): Number of cards of the bank, for the progress messages.
+            model_clients (ModelClientPool): Model clients for the generation.
+            hints_per_card (int): Number of valid hints kept for each card.
+        """
+        # The agents are imported with the first card, so loading a bank doesn't import autogen
+        from autogen_agentchat.messages import TextMessage
+        from autogen_core import CancellationToken
+        from .agents import HintGenerator
+        from .chats import REGENERATE_HINT_MESSAGE
+        from .evaluate_hint import get_forbidden_matcher
+        from .scheduler import BACKGROUND, set_priority
+        set_priority(BACKGROUND)
+        hint_generator = None
+        while not cards.empty():
+            card = cards.get_nowait()
+            forbidden = [card[f'forbidden_{i}'] for i in range(1, FORBIDDEN_PER_CARD + 1)]
+            if hint_generator is None:
+                hint_generator = HintGenerator(card['target'], forbidden, model_clients.get(self.model))
+            else:
+                hint_generator.set_card(card['target'], forbidden)
+                await hint_generator.on_reset(CancellationToken())
+            matcher = get_forbidden_matcher(tuple(forbidden) + (card['target'],))
+            hints = []
+            message = "Da una pista."
+            for _ in range(2 * hints_per_card):
+                try:
+                    response = await hint_generator.on_messages([TextMessage(content=message, source="system")], CancellationToken())
+                except Exception as e:
+                    print(f'ERROR EN LA CARTA {card["ID"]} : {e!r}')
+                    break
+                hint = response.chat_message.content
+                if matcher.evaluate(hint) != 'OK':
+                    message = REGENERATE_HINT_MESSAGE
+                    continue
+                if hint not in hints:
+                    hints.append(hint)
+                message = "Da una pista."
+                if len(hints) == hints_per_card:
+                    break
+            self.hints[card['ID']] = hints
+            print(f'[{len(self.hints)}/{total}] {card["target"]} : {len(hints)} pistas')
+
+def load_hint_corpus(path : str, card_store : CardStore) -> list:
+    """
+    Loads a corpus of hints with the forbidden words of their cards, to check the hint validation.
+
+    Args:
+        path (str): A hint bank (.gz) or a csv file with the columns ID (of the card) and hint.
+        card_store (CardStore): The cards of the hints.
+
+    Returns (list): Pairs (forbidden_words, hint), with the target word as the last forbidden word.
+    """
+    forbidden = {card_id : card_store.forbidden[i] + (card_store.targets[i],) for i, card_id in enumerate(card_store.ids)}
+    if path.endswith('.gz'):
+        return [(forbidden[card_id], hint) for card_id, hints in HintBank.load(path).hints.items() for hint in hints]
+    with open(path, encoding='utf-8', newline='') as f:
+        return [(forbidden[int(row['ID'])], row['hint']) for row in csv.DictReader(f)]
@@ -0,0 +1,57 @@
+from autogen_core.model_context import BufferedChatCompletionContext, ChatCompletionContext, UnboundedChatCompletionContext
+from autogen_core.models import AssistantMessage, UserMessage
+
+# Memory policies of the hint and guess generators within a card:
+# 'full' keeps the whole conversation, 'window' the last tries and 'summary' a compact list of the previous tries
+MEMORY_POLICIES = ('full', 'window', 'summary')
+
+class SummaryChatCompletionContext(UnboundedChatCompletionContext):
+    """
+    Model context that sends the model only the last message, preceded by a summary of the previous tries
+    (e.g. "Pistas anteriores: ...; ..."), so the prompt stays small while the agent still knows what it already said.
+
+    Attributes:
+        assistant_label (str): Label of the previous answers of the agent in the summary.
+        user_label (str): Label of the previous messages received by the agent in the summary. None to leave them out.
+    """
+    def __init__(self, assistant_label : str, user_label : str = None):
+        super().__init__()
+        self.assistant_label = assistant_label
+        self.user_label = user_label
+
+    async def get_messages(self) -> list:
+        if not self._messages or not isinstance(self._messages[-1], UserMessage):
+            return list(self._messages)
+        *previous, last = self._messages
+        lines = []
+        if self.user_label is not None:
+            received = [message.content for message in previous if isinstance(message, UserMessage) and isinstance(message.content, str)]
+            if received:
+                lines.append(f'{self.user_label}: {"; ".join(received)}')
+        answers = [message.content for message in previous if isinstance(message, AssistantMessage) and isinstance(message.content, str)]
+        if answers:
+            lines.append(f'{self.assistant_label}: {"; ".join(answers)}')
+        if not lines:
+            return [last]
+        return [UserMessage(content='\n'.join(lines + [last.content]), source=last.source)]
+
+def build_model_context(memory : str, assistant_label : str, user_label : str = None, window : int = 3) -> ChatCompletionContext:
+    """
+    Builds the model context of a generator agent for a memory policy.
+
+    Args:
+        memory (str): The memory policy: 'full', 'window' or 'summary'.
+        assistant_label (str): Label of the previous answers of the agent in the summary.
+        user_label (str): Label of the previous messages received by the agent in the summary. None to leave them out.
+        window (int): Number of previous tries (message and answer) kept by the 'window' policy, besides the current message.
+
+    Returns (ChatCompletionContext): The model context, or None for the default context of the agent (whole conversation).
+    """
+    if memory == 'full':
+        return None
+    elif memory == 'window':
+        # The buffer also holds the message being answered
+        return BufferedChatCompletionContext(buffer_size=2 * window + 1)
+    elif memory == 'summary':
+        return SummaryChatCompletionContext(assistant_label, user_label)
+    raise ValueError(f"Unknown memory policy: {memory}")
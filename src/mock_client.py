@@ -0,0 +1,140 @@
+import asyncio
+import itertools
+import json
+import random
+import re
+from autogen_core import FunctionCall
+from autogen_core.models import ChatCompletionClient, CreateResult, ModelInfo, RequestUsage, SystemMessage
+from .evaluate_hint import normalize_word
+
+# Words used by the default responder to build hints and wrong guesses
+MOCK_VOCABULARY = ["objeto", "grande", "pequeño", "antiguo", "famoso", "rápido", "redondo", "verde", "ruidoso",
+                   "útil", "brillante", "suave", "montaña", "invierno", "música", "cocina", "ciudad", "tiempo"]
+
+class MockRateLimitError(Exception):
+    """
+    Error raised by the mock client to simulate a request rejected for rate limits (HTTP 429).
+    """
+    status_code = 429
+
+class MockChatCompletionClient(ChatCompletionClient):
+    """
+    Deterministic local stand-in for OpenAIChatCompletionClient, so the game can be played without network.
+
+    The responses are scripted (a list of responses returned in order), given by a responder function
+    (called with the messages and tools of each request), or played by the default responder, which recognizes
+    the agent by its system message: hints are random words of MOCK_VOCABULARY, guesses are the target word
+    with probability hit_rate, guesses are evaluated (one by one or in JSON batches) comparing them with the target word
+    and hints sent to the HintEvaluator are answered with a call to the evaluate_hint tool.
+
+    Attributes:
+        responses (list): Scripted responses, returned in order and cyclically. None to use the responder.
+        responder (callable): Function (messages, tools) -> str | list[FunctionCall] used when there are no scripted responses.
+        latency (float): Mean simulated latency of each request, in seconds.
+        hit_rate (float): Probability that the default responder guesses the target word.
+        error_rate (float): Probability that a request is rejected with a MockRateLimitError, after its latency.
+        calls (int): Number of requests received.
+    """
+    def __init__(self, responses : list = None, responder = None, seed : int = None, latency : float = 0.0,
+                 hit_rate : float = 0.3, error_rate : float = 0.0):
+        self.responses = itertools.cycle(responses) if responses else None
+        self.responder = responder or self.default_responder
+        self.latency = latency
+        self.hit_rate = hit_rate
+        self.error_rate = error_rate
+        self.calls = 0
+        self._rng = random.Random(seed)
+        # Target word of each generated hint, so the guess generator can answer it
+        self._hint_targets = {}
+        self._last_usage = RequestUsage(prompt_tokens=0, completion_tokens=0)
+        self._total_usage = RequestUsage(prompt_tokens=0, completion_tokens=0)
+
+    @staticmethod
+    def _system_message(messages : list) -> str:
+        return next((message.content for message in messages if isinstance(message, SystemMessage)), '')
+
+    def default_responder(self, messages : list, tools : list):
+        """
+        Answers a request as the agent that sent it would, recognizing the agent by its system message.
+
+        Args:
+            messages (list): The messages of the request.
+            tools (list): The tools of the request.
+
+        Returns (str | list[FunctionCall]): The content of the response.
+        """
+        system_message = self._system_message(messages)
+        last_message = messages[-1].content if messages and isinstance(messages[-1].content, str) else ''
+        if tools and 'evaluate_hint' in system_message:
+            forbidden_words = system_message.split('lista', 1)[-1].strip().split(',')
+            arguments = json.dumps({'forbidden_words' : forbidden_words, 'hint' : last_message})
+            return [FunctionCall(id=f'call_{self.calls}', name='evaluate_hint', arguments=arguments)]
+        match = re.search(r'adivinar la palabra: (.+?), sin usar', system_message)
+        if match:
+            hint = ' '.join(self._rng.sample(MOCK_VOCABULARY, 3))
+            self._hint_targets[hint] = match.group(1)
+            return hint
+        if 'evaluar varias respuestas' in system_message:
+            items = json.loads(last_message)
+            verdicts = ['ACIERTO' if normalize_word(item['respuesta']) == normalize_word(item['palabra']) else 'NOK' for item in items]
+            return json.dumps({'resultados' : verdicts})
+        match = re.search(r'la siguiente palabra: (.+)', system_message)
+        if match:
+            return 'ACIERTO' if normalize_word(last_message) == normalize_word(match.group(1)) else 'NOK'
+        # The hint is the last line, after the summary of the previous tries if the agent's memory is a summary
+        target_word = self._hint_targets.get(last_message.rsplit('\n', 1)[-1])
+        if target_word is not None and self._rng.random() < self.hit_rate:
+            return target_word
+        return self._rng.choice(MOCK_VOCABULARY)
+
+    async def create(self, messages : list, *, tools : list = [], json_output = None, extra_create_args : dict = {},
+                     cancellation_token = None, **kwargs) -> CreateResult:
+        self.calls += 1
+        if self.latency:
+            delay = asyncio.ensure_future(asyncio.sleep(self._rng.uniform(0.5, 1.5) * self.latency))
+            if cancellation_token is not None:
+                cancellation_token.link_future(delay)
+            await delay
+        if self.error_rate and self._rng.random() < self.error_rate:
+            raise MockRateLimitError('Rate limit reached (mock)')
+        content = next(self.responses) if self.responses is not None else self.responder(messages, tools)
+        prompt_tokens = sum(len(str(message.content).split()) for message in messages)
+        completion_tokens = len(content.split()) if isinstance(content, str) else len(content)
+        self._last_usage = RequestUsage(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        self._total_usage = RequestUsage(prompt_tokens=self._total_usage.prompt_tokens + prompt_tokens,
+                                         completion_tokens=self._total_usage.completion_tokens + completion_tokens)
+        finish_reason = 'stop' if isinstance(content, str) else 'function_calls'
+        return CreateResult(finish_reason=finish_reason, content=content, usage=self._last_usage, cached=False)
+
+    async def create_stream(self, messages : list, *, tools : list = [], json_output = None,
+                            extra_create_args : dict = {}, cancellation_token = None, **kwargs):
+        result = await self.create(messages, tools=tools, json_output=json_output, extra_create_args=extra_create_args,
+                                   cancellation_token=cancellation_token)
+        if isinstance(result.content, str):
+            for chunk in re.findall(r'\S+\s*', result.content):
+                yield chunk
+        yield result
+
+    async def close(self) -> None:
+        pass
+
+    def actual_usage(self) -> RequestUsage:
+        return self._last_usage
+
+    def total_usage(self) -> RequestUsage:
+        return self._total_usage
+
+    def count_tokens(self, messages : list, *, tools : list = []) -> int:
+        return sum(len(str(message.content).split()) for message in messages)
+
+    def remaining_tokens(self, messages : list, *, tools : list = []) -> int:
+        return 128000 - self.count_tokens(messages, tools=tools)
+
+    @property
+    def capabilities(self) -> ModelInfo:
+        return self.model_info
+
+    @property
+    def model_info(self) -> ModelInfo:
+        return ModelInfo(vision=False, function_calling=True, json_output=True, family='unknown',
+                         structured_output=False)
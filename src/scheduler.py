@@ -0,0 +1,243 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import random
+import time
+
+# Priorities of the model requests: the lower, the sooner they are sent
+INTERACTIVE = 0
+BACKGROUND = 1
+# Priority of the requests sent by the current task. Every asyncio task has its own copy,
+# so the background tasks (card preparation, simulations) don't lower the priority of the turn being played
+_priority = contextvars.ContextVar('priority', default=INTERACTIVE)
+
+def set_priority(priority) -> None:
+    """
+    Sets the priority of the model requests sent from now on by the current task.
+
+    Args:
+        priority (int | callable): INTERACTIVE or BACKGROUND, or a function () -> int that returns it.
+                                   A function is checked again while the requests wait, so their priority can be raised.
+    """
+    _priority.set(priority)
+
+def current_priority() -> int:
+    """
+    Returns the priority of the model requests sent by the current task.
+
+    Returns (int): INTERACTIVE or BACKGROUND.
+    """
+    priority = _priority.get()
+    return priority() if callable(priority) else priority
+
+def is_rate_limit_error(error : Exception) -> bool:
+    """
+    Checks if an error of a model request is a rate limit error (HTTP 429), which can be retried later.
+
+    Args:
+        error (Exception): The error.
+
+    Returns (bool): True if the request was rejected for exceeding the rate limits.
+    """
+    return getattr(error, 'status_code', None) == 429
+
+class TokenBucket():
+    """
+    Token bucket that allows a number of units (requests or tokens) per minute, with bursts up to that number.
+
+    Attributes:
+        per_minute (int): Units refilled per minute, and capacity of the bucket. None for no limit.
+        tokens (float): Units available. Negative when more units were used than estimated.
+    """
+    def __init__(self, per_minute : int = None):
+        self.per_minute = per_minute
+        self.tokens = float(per_minute or 0)
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.per_minute, self.tokens + (now - self._updated) * self.per_minute / 60)
+        self._updated = now
+
+    def wait_time(self, amount : float) -> float:
+        """
+        Calculates how long to wait until some units are available.
+
+        Args:
+            amount (float): The units needed. Amounts above the capacity wait for a full bucket.
+
+        Returns (float): The time to wait, in seconds. 0 if the units are available.
+        """
+        if self.per_minute is None:
+            return 0.0
+        self._refill()
+        return max(0.0, (min(amount, self.per_minute) - self.tokens) * 60 / self.per_minute)
+
+    def take(self, amount : float) -> None:
+        """
+        Takes some units from the bucket. A negative amount gives back units that were not used.
+
+        Args:
+            amount (float): The units taken.
+        """
+        if self.per_minute is None:
+            return
+        self._refill()
+        self.tokens -= amount
+
+class RequestScheduler():
+    """
+    Sends the model requests of the process within the rate limits of the provider.
+
+    The requests wait for their turn in a priority queue (interactive turns before background traffic) until
+    the request and token buckets allow them. Requests rejected with a rate limit error are retried after
+    a jittered exponential backoff, and identical requests sent while the first one is in flight share its response.
+
+    Attributes:
+        requests (TokenBucket): Limit of requests per minute.
+        tokens (TokenBucket): Limit of tokens (prompt and completion) per minute.
+        max_retries (int): Maximum number of retries of a request rejected for rate limits.
+        base_delay (float): Delay before the first retry, in seconds. It doubles with every retry.
+        sent (int): Number of requests sent, including the retries.
+        retries (int): Number of retried requests.
+        coalesced (int): Number of requests answered with the response of an identical request in flight.
+        wait_time (float): Total time the requests waited for their turn, in seconds.
+    """
+    def __init__(self, requests_per_minute : int = None, tokens_per_minute : int = None, max_retries : int = 5,
+                 base_delay : float = 1.0):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.sent = 0
+        self.retries = 0
+        self.coalesced = 0
+        self.wait_time = 0.0
+        self._queue = []
+        self._tickets = itertools.count()
+        self._condition = asyncio.Condition()
+        self._in_flight = {}
+
+    async def acquire(self, tokens : int) -> None:
+        """
+        Waits until a request can be sent: it is the first in the queue and the buckets have room for it.
+
+        Args:
+            tokens (int): The estimated tokens of the request.
+        """
+        ticket = (current_priority(), next(self._tickets))
+        start = time.perf_counter()
+        async with self._condition:
+            heapq.heappush(self._queue, ticket)
+            # The first request of the queue may have changed
+            self._condition.notify_all()
+            try:
+                while True:
+                    if current_priority() != ticket[0]:
+                        # The priority of the task changed while waiting (a prepared card is now being played)
+                        self._queue.remove(ticket)
+                        ticket = (current_priority(), ticket[1])
+                        self._queue.append(ticket)
+                        heapq.heapify(self._queue)
+                        self._condition.notify_all()
+                    if self._queue[0] != ticket:
+                        await self._condition.wait()
+                        continue
+                    wait = max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+                    if wait == 0:
+                        self.requests.take(1)
+                        self.tokens.take(tokens)
+                        return
+                    try:
+                        await asyncio.wait_for(self._condition.wait(), wait)
+                    except asyncio.TimeoutError:
+                        pass
+            finally:
+                self._queue.remove(ticket)
+                heapq.heapify(self._queue)
+                self._condition.notify_all()
+                self.wait_time += time.perf_counter() - start
+
+    async def send(self, request, tokens : int):
+        """
+        Sends a request when its turn comes, retrying it while it is rejected for rate limits.
+
+        Args:
+            request (callable): Function () -> awaitable that sends the request and returns its CreateResult.
+            tokens (int): The estimated tokens of the request.
+
+        Returns (CreateResult): The response of the request.
+        """
+        for attempt in range(self.max_retries + 1):
+            await self.acquire(tokens)
+            self.sent += 1
+            try:
+                result = await request()
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt == self.max_retries:
+                    raise
+                await self.backoff(attempt)
+                continue
+            if result.usage is not None:
+                # The bucket is corrected with the real tokens of the request
+                self.tokens.take(result.usage.prompt_tokens + result.usage.completion_tokens - tokens)
+            return result
+
+    async def backoff(self, attempt : int) -> None:
+        """
+        Waits before retrying a request rejected for rate limits: base_delay doubled on every attempt,
+        with a random jitter of +-50% so the rejected requests don't retry all at the same time.
+
+        Args:
+            attempt (int): Number of the failed attempt, from 0.
+        """
+        self.retries += 1
+        await asyncio.sleep(self.base_delay * 2 ** attempt * random.uniform(0.5, 1.5))
+
+    async def send_coalesced(self, key : str, request, tokens : int, cancellation_token = None):
+        """
+        Sends a request like send, unless an identical request is in flight: then its response is shared.
+        A cancelled caller stops waiting for the shared request, which is only cancelled when no caller waits for it.
+
+        Args:
+            key (str): The key of the request (see ResponseCache.make_key).
+            request (callable): Function () -> awaitable that sends the request and returns its CreateResult.
+            tokens (int): The estimated tokens of the request.
+            cancellation_token (CancellationToken): Token to cancel the wait of this caller. None to wait until the end.
+
+        Returns (CreateResult): The response of the request, without usage if it was shared.
+        """
+        entry = self._in_flight.get(key)
+        shared = entry is not None
+        if shared:
+            self.coalesced += 1
+        else:
+            # The shared task and the number of callers waiting for it
+            entry = [asyncio.ensure_future(self.send(request, tokens)), 0]
+            self._in_flight[key] = entry
+            entry[0].add_done_callback(lambda _ : self._in_flight.pop(key) if self._in_flight.get(key) is entry else None)
+        task = entry[0]
+        entry[1] += 1
+        waiter = asyncio.shield(task)
+        if cancellation_token is not None:
+            cancellation_token.link_future(waiter)
+        try:
+            result = await waiter
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and not task.done():
+                task.cancel()
+        if shared:
+            from autogen_core.models import RequestUsage
+            return result.model_copy(update={'usage' : RequestUsage(prompt_tokens=0, completion_tokens=0)})
+        return result
+
+    def stats(self) -> str:
+        """
+        Builds a printable summary of the requests sent by the scheduler.
+
+        Returns (str): The summary.
+        """
+        return (f'PETICIONES : {self.sent} enviadas, {self.retries} reintentos, {self.coalesced} agrupadas, '
+                f'{self.wait_time:.1f}s de espera')
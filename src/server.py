@@ -0,0 +1,104 @@
+import asyncio
+import itertools
+from .clients import ModelClientPool
+from .console import QueueInput, output, set_writer
+from .deck import CardStore
+from .evaluate_hint import warm_up_spacy
+from .game import Game
+from .tracing import set_trace_context
+
+class GameServer():
+    """
+    Line-based TCP server that hosts a game for every connection, all of them in the same event loop.
+
+    Every line sent by a client is a message of its player, and the messages of its game are sent back as text.
+    The games share the cards, the model clients and the Spacy pipeline of the process.
+
+    Attributes:
+        cards_path (str): Path to the cards csv file.
+        model (str): Model used for llm calls.
+        rounds (int): Number of rounds of each game.
+        cards_per_turn (int): Number of cards used per turn.
+        host (str): Address the server listens on.
+        port (int): Port the server listens on.
+        game_options (dict): Other arguments of the games (hint_validation, pipelined, streaming, memory).
+        card_store (CardStore): The cards, shared by all the games.
+        model_clients (ModelClientPool): Model clients shared by all the games, closed when the server stops.
+        sessions (dict): The games being played, indexed by session number.
+    """
+    def __init__(self, cards_path : str, model : str, rounds : int, cards_per_turn : int, host : str = '127.0.0.1',
+                 port : int = 8765, model_clients : ModelClientPool = None, **game_options):
+        self.cards_path = cards_path
+        self.model = model
+        self.rounds = rounds
+        self.cards_per_turn = cards_per_turn
+        self.host = host
+        self.port = port
+        self.game_options = game_options
+        self.card_store = CardStore.load(cards_path)
+        self.model_clients = model_clients or ModelClientPool()
+        self.sessions = {}
+        self._session_numbers = itertools.count(1)
+
+    async def serve_forever(self) -> None:
+        """
+        Accepts connections until the server is stopped, then closes the model clients.
+        """
+        warm_up_spacy()
+        server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        print(f'SERVIDOR ESCUCHANDO EN {self.host}:{self.port}')
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.model_clients.close()
+
+    async def handle_connection(self, reader : asyncio.StreamReader, writer : asyncio.StreamWriter) -> None:
+        """
+        Plays a game with the player of a connection. The game ends when the player leaves or disconnects.
+
+        Args:
+            reader (asyncio.StreamReader): The messages of the player, one per line.
+            writer (asyncio.StreamWriter): Where the messages of the game are sent.
+        """
+        session = next(self._session_numbers)
+        # Every connection runs in its own task, so its writer and trace fields are copied to the tasks of its game only
+        set_writer(lambda text : writer.write(text.encode('utf-8')))
+        set_trace_context(session=session)
+        player_input = QueueInput()
+        game = Game(self.cards_path, self.model, self.rounds, self.cards_per_turn, model_clients=self.model_clients,
+                    input_func=player_input.read, card_store=self.card_store, **self.game_options)
+        self.sessions[session] = game
+        print(f'PARTIDA {session} : CONECTADA ({len(self.sessions)} EN CURSO)')
+        game_task = asyncio.create_task(game.play_rounds())
+        reading_task = asyncio.create_task(self.read_player(reader, player_input))
+        try:
+            await asyncio.wait((game_task, reading_task), return_when=asyncio.FIRST_COMPLETED)
+            if game_task.done():
+                output(game_task.result())
+        except Exception as e:
+            print(f'ERROR EN LA PARTIDA {session} : {e!r}')
+        finally:
+            # A disconnected player cancels the game, and a finished game stops reading the player
+            game_task.cancel()
+            reading_task.cancel()
+            await asyncio.gather(game_task, reading_task, return_exceptions=True)
+            del self.sessions[session]
+            print(f'PARTIDA {session} : TERMINADA ({len(self.sessions)} EN CURSO)')
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    @staticmethod
+    async def read_player(reader : asyncio.StreamReader, player_input : QueueInput) -> None:
+        """
+        Passes the lines received from a player to its input, until the connection is closed.
+
+        Args:
+            reader (asyncio.StreamReader): The connection of the player.
+            player_input (QueueInput): The input of the player's game.
+        """
+        while line := await reader.readline():
+            player_input.put(line.decode('utf-8', errors='replace').strip())
@@ -0,0 +1,278 @@
+import asyncio
+import csv
+import os
+import time
+from collections import Counter, defaultdict
+from .batching import GuessBatcher
+from .chats import CpuChat
+from .clients import ModelClientPool
+from .deck import CardStore, Deck
+from .evaluate_guess import load_synonyms
+from .hint_bank import HintBank
+from .scheduler import BACKGROUND, set_priority
+from .game import score_for_tries
+from .tracing import percentile, set_trace_context
+
+class SimulationReport():
+    """
+    Results of a simulation: one record for each card played.
+
+    Attributes:
+        results (list): The played cards, as dicts with the keys ID, target, result, tries and time.
+        wall_time (float): Total time of the simulation, in seconds.
+    """
+    def __init__(self, results : list, wall_time : float):
+        self.results = results
+        self.wall_time = wall_time
+
+    def success_rate(self) -> float:
+        """
+        Calculates the fraction of played cards that were guessed.
+
+        Returns (float): The success rate.
+        """
+        if not self.results:
+            return 0.0
+        return sum(result['result'] == 'ACIERTO' for result in self.results) / len(self.results)
+
+    def card_stats(self) -> list:
+        """
+        Counts the plays and hits of each card.
+
+        Returns (list): The stats of each card, as dicts with the keys ID, target, plays, hits and success_rate,
+                        from the lowest success rate to the highest.
+        """
+        played = defaultdict(list)
+        targets = {}
+        for result in self.results:
+            played[result['ID']].append(result['result'] == 'ACIERTO')
+            targets[result['ID']] = result['target']
+        stats = [{'ID' : card_id, 'target' : targets[card_id], 'plays' : len(hits), 'hits' : sum(hits),
+                  'success_rate' : sum(hits) / len(hits)} for card_id, hits in played.items()]
+        return sorted(stats, key=lambda card : (card['success_rate'], -card['plays'], card['ID']))
+
+    def card_success_rates(self) -> dict:
+        """
+        Calculates the fraction of times each card was guessed.
+
+        Returns (dict): The success rate of each card, indexed by card ID.
+        """
+        return {card['ID'] : card['success_rate'] for card in self.card_stats()}
+
+    def tries_distribution(self) -> Counter:
+        """
+        Counts the guessed cards for each number of tries.
+
+        Returns (Counter): Number of guessed cards, indexed by number of tries.
+        """
+        return Counter(result['tries'] for result in self.results if result['result'] == 'ACIERTO')
+
+    def mean_tries(self) -> float:
+        """
+        Calculates the mean number of tries of the guessed cards.
+
+        Returns (float): The mean tries, or 0 if no card was guessed.
+        """
+        tries = [result['tries'] for result in self.results if result['result'] == 'ACIERTO']
+        return sum(tries) / len(tries) if tries else 0.0
+
+    def points(self) -> int:
+        """
+        Calculates the points of the played cards, as the CPU would score them in a game.
+
+        Returns (int): The total points.
+        """
+        return sum(score_for_tries(result['tries']) for result in self.results if result['result'] == 'ACIERTO')
+
+    def time_percentile(self, q : float) -> float:
+        """
+        Calculates a quantile of the time per card.
+
+        Args:
+            q (float): The quantile, from 0 to 1.
+
+        Returns (float): The time, in seconds.
+        """
+        return percentile(sorted(result['time'] for result in self.results), q)
+
+    def summary(self, worst_cards : int = 10) -> str:
+        """
+        Builds a printable summary of the simulation.
+
+        Args:
+            worst_cards (int): Number of cards with the lowest success rate listed with their hits and plays.
+
+        Returns (str): The summary.
+        """
+        results = Counter(result['result'] for result in self.results)
+        card_times = sorted(result['time'] for result in self.results)
+        card_stats = self.card_stats()
+        missed = [card for card in card_stats if card['success_rate'] < 1][:worst_cards]
+        lines = [f'CARTAS JUGADAS : {len(self.results)} ({len(card_stats)} distintas)',
+                 f'TASA DE ACIERTO : {self.success_rate():.1%}',
+                 f'CARTAS ACERTADAS SIEMPRE : {sum(card["hits"] == card["plays"] for card in card_stats)}, '
+                 f'NUNCA : {sum(card["hits"] == 0 for card in card_stats)}',
+                 'RESULTADOS : ' + ', '.join(f'{result} {count}' for result, count in results.most_common()),
+                 'INTENTOS (ACIERTOS) : ' + ', '.join(f'{tries}: {count}' for tries, count in sorted(self.tries_distribution().items()))]
+        if card_times:
+            lines.append(f'TIEMPO POR CARTA : media {sum(card_times) / len(card_times):.2f}s, '
+                         f'máximo {card_times[-1]:.2f}s')
+        if missed:
+            lines.append('PEORES CARTAS : ' + ', '.join(f'{card["target"]} {card["success_rate"]:.0%} ({card["hits"]}/{card["plays"]})'
+                                                         for card in missed))
+        lines.append(f'TIEMPO TOTAL : {self.wall_time:.2f}s')
+        return '\n'.join(lines)
+
+    def to_csv(self, path : str) -> None:
+        """
+        Saves the result of each played card in a csv file.
+
+        Args:
+            path (str): Path of the csv file.
+        """
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=['ID', 'target', 'result', 'tries', 'time'])
+            writer.writeheader()
+            writer.writerows(self.results)
+
+    def cards_to_csv(self, path : str) -> None:
+        """
+        Saves the plays, hits and success rate of each card in a csv file.
+
+        Args:
+            path (str): Path of the csv file.
+        """
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=['ID', 'target', 'plays', 'hits', 'success_rate'])
+            writer.writeheader()
+            writer.writerows(self.card_stats())
+
+class Simulation():
+    """
+    Plays CPU rounds over the deck concurrently, without a human player, to measure the quality of a model.
+
+    Every worker owns a CpuChat and plays the sampled cards one after another, so at most `concurrency`
+    rounds are in flight at the same time.
+
+    Attributes:
+        cards (list): The sampled cards, repeated as many times as they are played.
+        model (str): Model used for llm calls.
+        concurrency (int): Maximum number of rounds played at the same time.
+        hint_validation (str): How hints are validated: 'local' (in process) or 'llm' (HintEvaluator agent).
+        pipelined (bool): Whether the agents of each round run overlapped.
+        streaming (bool): Whether the hints are streamed, aborting and regenerating the ones that use forbidden words.
+        memory (str): What the hint and guess generators remember of the previous tries of a card: 'full', 'window' or 'summary'.
+        hint_bank (HintBank): Hints generated in advance for the cards, given before generating new ones. None to generate all the hints.
+        guess_batcher (GuessBatcher): Evaluates the ambiguous guesses of the concurrent rounds together. None to evaluate them one by one.
+        synonyms (dict): Synonyms accepted as hits for some cards, indexed by card ID.
+        model_clients (ModelClientPool): Model clients shared by all the rounds.
+        label (str): Prefix of the progress messages. None for no prefix.
+    """
+    def __init__(self, cards_path : str, model : str, n_cards : int = None, repeats : int = 1, concurrency : int = 8,
+                 seed : int = None, hint_validation : str = 'local', model_clients : ModelClientPool = None,
+                 pipelined : bool = False, streaming : bool = False, memory : str = 'full',
+                 hint_bank : HintBank = None, batch_window : float = None, label : str = None):
+        """
+        Initializes the simulation, sampling the cards to play.
+
+        Args:
+            cards_path (str): Path to the CSV file containing the cards csv.
+            model (str): Model to be used for llm calls.
+            n_cards (int): Number of cards sampled from the deck. All the cards if None.
+            repeats (int): Number of times each sampled card is played.
+            concurrency (int): Maximum number of rounds played at the same time.
+            seed (int): Seed for the card sampling.
+            hint_validation (str): How hints are validated: 'local' (in process) or 'llm' (HintEvaluator agent).
+            model_clients (ModelClientPool): Model clients for the simulation. A new pool of OpenAI clients if None.
+            pipelined (bool): Whether the agents of each round run overlapped, generating the guess while the hint
+                              is validated and the next hint while the guess is evaluated.
+            streaming (bool): Whether the hints are streamed, so a hint is aborted and generated again as soon as
+                              it uses a forbidden word.
+            memory (str): What the hint and guess generators remember of the previous tries of a card: the whole
+                          conversation ('full'), the last tries ('window') or a summary of the previous hints and guesses ('summary').
+            hint_bank (HintBank): Hints generated in advance for the cards, given before generating new ones.
+                                  None to generate all the hints.
+            batch_window (float): Time the ambiguous guesses wait to be evaluated together with the guesses of other rounds
+                                  in a single request, in seconds. None to evaluate them one by one.
+            label (str): Prefix of the progress messages, to tell apart simulations run at the same time. None for no prefix.
+        """
+        deck = Deck(CardStore.load(cards_path), seed)
+        n_cards = len(deck) if n_cards is None else min(n_cards, len(deck))
+        cards = [deck.draw() for _ in range(n_cards)]
+        self.cards = [card for card in cards for _ in range(repeats)]
+        self.model = model
+        self.concurrency = concurrency
+        self.hint_validation = hint_validation
+        self.pipelined = pipelined
+        self.streaming = streaming
+        self.memory = memory
+        self.hint_bank = hint_bank
+        self.synonyms = load_synonyms(os.path.join(os.path.dirname(cards_path), 'synonyms.csv'))
+        self.model_clients = model_clients or ModelClientPool()
+        self.label = label
+        self.guess_batcher = None
+        if batch_window is not None:
+            self.guess_batcher = GuessBatcher(self.model_clients.get(model, temperature=0), batch_window, max_batch=concurrency)
+
+    async def play_card(self, chat : CpuChat, card : dict) -> dict:
+        """
+        Plays a card with the given chat.
+
+        Args:
+            chat (CpuChat): The chat used to play the card.
+            card (dict): The card to play.
+
+        Returns (dict): The result of the card, with the keys ID, target, result, tries and time.
+        """
+        forbidden = [card['forbidden_1'], card['forbidden_2'], card['forbidden_3'], card['forbidden_4'], card['forbidden_5']]
+        set_trace_context(card=card['ID'], turn='cpu')
+        start = time.perf_counter()
+        try:
+            hints = self.hint_bank.get(card['ID']) if self.hint_bank is not None else None
+            await chat.set_card(forbidden, card['target'], self.synonyms.get(card['ID']), hints)
+            chat_result, tries = await chat.initiate_round()
+        except Exception as e:
+            print(f'ERROR EN LA CARTA {card["ID"]} : {e!r}')
+            chat_result, tries = 'ERROR', 0
+        return {'ID' : card['ID'], 'target' : card['target'], 'result' : chat_result, 'tries' : tries,
+                'time' : time.perf_counter() - start}
+
+    async def worker(self, cards : asyncio.Queue, results : list) -> None:
+        """
+        Plays cards from the queue until it is empty.
+
+        Args:
+            cards (asyncio.Queue): The cards left to play.
+            results (list): The list where the results are appended.
+        """
+        # The simulations don't slow down the games sharing the scheduler
+        set_priority(BACKGROUND)
+        chat = None
+        while not cards.empty():
+            card = cards.get_nowait()
+            if chat is None:
+                forbidden = [card['forbidden_1'], card['forbidden_2'], card['forbidden_3'], card['forbidden_4'], card['forbidden_5']]
+                chat = CpuChat(self.model_clients, self.model, forbidden, card['target'], self.hint_validation, verbose=False,
+                               pipelined=self.pipelined, streaming=self.streaming, memory=self.memory,
+                               guess_batcher=self.guess_batcher)
+            result = await self.play_card(chat, card)
+            results.append(result)
+            prefix = f'{self.label} ' if self.label else ''
+            print(f'{prefix}[{len(results)}/{len(self.cards)}] {result["target"]} : {result["result"]} ({result["tries"]} intentos, {result["time"]:.1f}s)')
+
+    async def run(self) -> SimulationReport:
+        """
+        Plays all the sampled cards and closes the model clients at the end.
+
+        Returns (SimulationReport): The results of the simulation.
+        """
+        cards = asyncio.Queue()
+        for card in self.cards:
+            cards.put_nowait(card)
+        results = []
+        start = time.perf_counter()
+        try:
+            await asyncio.gather(*(self.worker(cards, results) for _ in range(self.concurrency)))
+        finally:
+            await self.model_clients.close()
+        return SimulationReport(results, time.perf_counter() - start)
@@ -0,0 +1,47 @@
+import re
+
+# Spanish function words removed from the hints by the rule-based tokenizer. They are the words that the Spacy
+# backend tags with the filtered parts of speech (FILTERED_POS): determiners, prepositions, subordinating
+# conjunctions, auxiliary verbs, pronouns and adverbs. Coordinating conjunctions (y, o, pero...) are kept, as in Spacy
+DETERMINERS = """el la los las lo un una unos unas al del este esta estos estas ese esa esos esas aquel aquella aquellos
+aquellas mi mis tu tus su sus nuestro nuestra nuestros nuestras vuestro vuestra vuestros vuestras cada cualquier cualquiera
+ambos ambas otro otra otros otras todo toda todos todas mucho mucha muchos muchas poco poca pocos pocas varios varias
+cierto cierta ciertos ciertas demasiado demasiada demasiados demasiadas tanto tanta tantos tantas alguno alguna algunos
+algunas algún ninguno ninguna ningunos ningunas ningún qué cuál cuáles cuánto cuánta cuántos cuántas cuyo cuya cuyos cuyas
+dicho dicha dichos dichas tal tales"""
+PREPOSITIONS = """a ante bajo cabe con contra de desde durante en entre hacia hasta mediante para por según sin so sobre tras
+versus vía"""
+SUBORDINATING_CONJUNCTIONS = """que porque pues aunque si como cuando donde mientras conque"""
+AUXILIARY_VERBS = """es son soy eres somos sois era eras eran éramos fue fueron fui fuiste fuimos será serán sería serían
+sea sean seas sido siendo está están estoy estás estamos estaba estaban estuvo estuvieron esté estén estando ha han he has
+hemos habéis había habían hay haber habido habrá habrán habría hubo haya hayan puede pueden"""
+PRONOUNS = """yo tú él ella ello nosotros nosotras vosotros vosotras ellos ellas usted ustedes me te se nos os le les mí ti
+sí conmigo contigo consigo quien quienes cual cuales cuanto cuanta cuantos cuantas algo alguien nada nadie esto eso
+aquello mío mía míos mías tuyo tuya tuyos tuyas suyo suya suyos suyas"""
+ADVERBS = """no muy más menos ya también tampoco siempre nunca jamás aquí allí allá ahí acá ahora antes después luego bien
+mal tan así casi solo sólo todavía aún además incluso quizá quizás bastante cerca lejos dentro fuera arriba abajo encima
+debajo delante detrás pronto tarde temprano hoy ayer adónde dónde cómo cuándo"""
+
+STOPWORDS = frozenset(' '.join([DETERMINERS, PREPOSITIONS, SUBORDINATING_CONJUNCTIONS, AUXILIARY_VERBS, PRONOUNS, ADVERBS]).split())
+# Words of a hint: letters and digits, with the punctuation left out
+WORD_PATTERN = re.compile(r'\w+')
+# Adverbs ending in -mente (rápidamente, solamente...)
+ADVERB_SUFFIX = 'mente'
+
+def rule_main_words(sentence : str) -> list:
+    """
+    Extracts the main words from a sentence without Spacy: the words that are not Spanish function words
+    (see STOPWORDS) or adverbs ending in -mente.
+
+    Args:
+        sentence (str): The input sentence from which main words are extracted.
+
+    Returns (list): A list of main words from the sentence.
+    """
+    main_words = []
+    for word in WORD_PATTERN.findall(sentence):
+        lower = word.lower()
+        if lower in STOPWORDS or (lower.endswith(ADVERB_SUFFIX) and len(lower) > len(ADVERB_SUFFIX) + 2):
+            continue
+        main_words.append(word)
+    return main_words
@@ -0,0 +1,144 @@
+import contextvars
+import json
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+# Fields of the current card (card ID, turn type, try number), added to every traced event.
+# Every asyncio task has its own copy, so concurrent rounds don't mix their fields
+_trace_context = contextvars.ContextVar('trace_context', default={})
+# The tracer that records the events. None if tracing is disabled
+_tracer = None
+
+class Tracer():
+    """
+    Records timed events of a game (agent runs, player inputs, hint checks, card draws) as JSON lines.
+
+    Attributes:
+        path (str): Path of the JSONL trace file. None to keep only the summary.
+        events (dict): The wall time (ms) and token usage of the events, indexed by (kind, name), for the summary.
+    """
+    def __init__(self, path : str = None):
+        self.path = path
+        self.events = defaultdict(list)
+        self._file = open(path, 'a', encoding='utf-8') if path else None
+        self._lock = threading.Lock()
+
+    def record(self, event : dict) -> None:
+        """
+        Records an event, adding the fields of the current card.
+
+        Args:
+            event (dict): The event, with at least the keys kind, name and ms.
+        """
+        event = {'time' : time.time(), **_trace_context.get(), **event}
+        with self._lock:
+            self.events[(event['kind'], event['name'])].append(event)
+            if self._file is not None:
+                self._file.write(json.dumps(event, ensure_ascii=False) + '\n')
+                self._file.flush()
+
+    def summary(self) -> str:
+        """
+        Builds a printable summary of the events: count, p50 and p95 of the wall time and tokens of each agent or function.
+
+        Returns (str): The summary.
+        """
+        lines = ['TIEMPOS (ms) :']
+        for (kind, name), events in sorted(self.events.items()):
+            times = sorted(event['ms'] for event in events)
+            line = (f' {kind} {name} : {len(times)} llamadas, p50 {percentile(times, 0.5):.1f}, '
+                    f'p95 {percentile(times, 0.95):.1f}, total {sum(times):.0f}')
+            prompt_tokens = sum(event.get('prompt_tokens', 0) for event in events)
+            completion_tokens = sum(event.get('completion_tokens', 0) for event in events)
+            if prompt_tokens or completion_tokens:
+                line += f', tokens {prompt_tokens} + {completion_tokens}'
+            lines.append(line)
+        return '\n'.join(lines)
+
+    def close(self) -> None:
+        """
+        Closes the trace file.
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+def percentile(values : list, q : float) -> float:
+    """
+    Calculates a quantile of a sorted list of values, by the nearest rank.
+
+    Args:
+        values (list): The sorted values.
+        q (float): The quantile, from 0 to 1.
+
+    Returns (float): The quantile, or 0 if the list is empty.
+    """
+    if not values:
+        return 0.0
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+def set_tracer(tracer : Tracer) -> None:
+    """
+    Sets the tracer that records the events of the process. None to disable tracing.
+
+    Args:
+        tracer (Tracer): The tracer.
+    """
+    global _tracer
+    _tracer = tracer
+
+def set_trace_context(**fields) -> None:
+    """
+    Sets fields of the current card (e.g. card, turn, try_number) for the events traced from now on in the current task.
+
+    Args:
+        fields: The fields to set. The other fields of the context are kept.
+    """
+    _trace_context.set({**_trace_context.get(), **fields})
+
+@contextmanager
+def trace(kind : str, name : str):
+    """
+    Measures the wall time of a block and records it as an event, if tracing is enabled.
+    The block can add fields (e.g. token usage) to the yielded event.
+
+    Args:
+        kind (str): The kind of event: 'agent', 'player', 'tool' or 'deck'.
+        name (str): The name of the agent or function.
+
+    Yields (dict): The event.
+    """
+    event = {'kind' : kind, 'name' : name}
+    if _tracer is None:
+        yield event
+        return
+    start = time.perf_counter()
+    try:
+        yield event
+    except BaseException as e:
+        event['error'] = type(e).__name__
+        raise
+    finally:
+        event['ms'] = (time.perf_counter() - start) * 1e3
+        _tracer.record(event)
+
+def response_usage(response) -> dict:
+    """
+    Sums the token usage and counts the tool calls of an agent's response, including its inner messages.
+
+    Args:
+        response (Response): The agent's response.
+
+    Returns (dict): The keys prompt_tokens, completion_tokens and tool_calls.
+    """
+    from autogen_agentchat.messages import ToolCallRequestEvent
+    usage = {'prompt_tokens' : 0, 'completion_tokens' : 0, 'tool_calls' : 0}
+    for message in list(response.inner_messages or []) + [response.chat_message]:
+        if message.models_usage is not None:
+            usage['prompt_tokens'] += message.models_usage.prompt_tokens
+            usage['completion_tokens'] += message.models_usage.completion_tokens
+        if isinstance(message, ToolCallRequestEvent):
+            usage['tool_calls'] += len(message.content)
+    return usage
@@ -0,0 +1,65 @@
+import asyncio
+import pytest
+from src.cache import ResponseCache
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'cache.sqlite'), max_entries=2)
+    yield cache
+    cache.close()
+
+def test_missing_response_is_a_miss(cache):
+    assert cache.get('key') is None
+    assert (cache.hits, cache.misses) == (0, 1)
+
+def test_stored_response_is_a_hit(cache):
+    cache.put('key', 'result')
+    assert cache.get('key') == 'result'
+    assert (cache.hits, cache.misses) == (1, 0)
+
+def test_least_recently_used_responses_are_evicted(cache):
+    cache.put('a', '1')
+    cache.put('b', '2')
+    cache.get('a')
+    cache.put('c', '3')
+    assert cache.get('b') is None
+    assert cache.get('a') == '1'
+    assert cache.get('c') == '3'
+
+def test_responses_persist_across_instances(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    cache = ResponseCache(path)
+    cache.put('key', 'result')
+    cache.close()
+    cache = ResponseCache(path)
+    assert cache.get('key') == 'result'
+    cache.close()
+
+class TestCachedClient():
+    @pytest.fixture(autouse=True)
+    def requires_autogen(self):
+        pytest.importorskip('autogen_core')
+
+    @staticmethod
+    def messages(system : str, text : str) -> list:
+        from autogen_core.models import SystemMessage, UserMessage
+        return [SystemMessage(content=system), UserMessage(content=text, source='user')]
+
+    def test_repeated_request_is_answered_from_the_cache(self, cache):
+        from src.client_wrappers import CachedChatCompletionClient
+        from src.mock_client import MockChatCompletionClient
+        mock = MockChatCompletionClient(responses=['ACIERTO', 'NOK'])
+        client = CachedChatCompletionClient(mock, cache, 'mock')
+        first = asyncio.run(client.create(self.messages('Evalúa', 'perro')))
+        repeated = asyncio.run(client.create(self.messages('Evalúa', 'perro')))
+        other = asyncio.run(client.create(self.messages('Evalúa', 'gato')))
+        assert mock.calls == 2
+        assert (first.content, repeated.content, other.content) == ('ACIERTO', 'ACIERTO', 'NOK')
+        assert repeated.cached and not first.cached
+        assert (repeated.usage.prompt_tokens, repeated.usage.completion_tokens) == (0, 0)
+
+    def test_key_depends_on_model_and_system_message(self):
+        messages = self.messages('Evalúa', 'perro')
+        assert ResponseCache.make_key('a', messages) == ResponseCache.make_key('a', self.messages('Evalúa', 'perro'))
+        assert ResponseCache.make_key('a', messages) != ResponseCache.make_key('b', messages)
+        assert ResponseCache.make_key('a', messages) != ResponseCache.make_key('a', self.messages('Otra', 'perro'))
@@ -0,0 +1,65 @@
+import asyncio
+import pytest
+
+pytest.importorskip('autogen_agentchat')
+
+from autogen_agentchat.base import Response
+from autogen_agentchat.messages import ModelClientStreamingChunkEvent, TextMessage
+from autogen_core.model_context import UnboundedChatCompletionContext
+from autogen_core.models import AssistantMessage
+from src.chats import hint_run_stream
+from src.evaluate_hint import ForbiddenMatcher, get_tokenizer, set_tokenizer
+
+@pytest.fixture(autouse=True, params=['rules', 'spacy'])
+def tokenizer(request):
+    if request.param == 'spacy':
+        pytest.importorskip('spacy')
+    previous = get_tokenizer()
+    set_tokenizer(request.param)
+    yield request.param
+    set_tokenizer(previous)
+
+class StreamingAgent():
+    """
+    Streams the given hints, one per run, in chunks of a few characters, as a streaming AssistantAgent does.
+    """
+    def __init__(self, hints : list):
+        self.name = 'HintGenerator'
+        self.hints = list(hints)
+        self.runs = 0
+        self.model_context = UnboundedChatCompletionContext()
+
+    async def on_messages_stream(self, messages, cancellation_token):
+        hint = self.hints[self.runs]
+        self.runs += 1
+        for i in range(0, len(hint), 3):
+            if cancellation_token.is_cancelled():
+                return
+            yield ModelClientStreamingChunkEvent(content=hint[i:i + 3], source=self.name)
+        await self.model_context.add_message(AssistantMessage(content=hint, source=self.name))
+        yield Response(chat_message=TextMessage(content=hint, source=self.name))
+
+def run_hints(hints : list, forbidden : list) -> tuple:
+    agent = StreamingAgent(hints)
+    response = asyncio.run(hint_run_stream(agent, ForbiddenMatcher(forbidden), verbose=False))
+    return response, agent.runs
+
+def test_valid_hint_is_returned():
+    response, runs = run_hints(['Sirve para beber.'], ['Agua', 'Vaso'])
+    assert response.chat_message.content == 'Sirve para beber.'
+    assert runs == 1
+
+def test_forbidden_word_in_the_middle_is_regenerated():
+    response, runs = run_hints(['Es agua fría.', 'Sirve para beber.'], ['Agua'])
+    assert response.chat_message.content == 'Sirve para beber.'
+    assert runs == 2
+
+def test_forbidden_last_word_without_punctuation_is_regenerated():
+    response, runs = run_hints(['Sirve para beber agua', 'Sale del grifo'], ['Agua'])
+    assert response.chat_message.content == 'Sale del grifo'
+    assert runs == 2
+
+def test_every_hint_forbidden_returns_none():
+    response, runs = run_hints(['Beber agua'] * 3, ['Agua'])
+    assert response is None
+    assert runs == 3
@@ -0,0 +1,72 @@
+import os
+import pytest
+from src import evaluate_guess, evaluate_hint
+from src.deck import CardStore
+from src.evaluate_hint import get_tokenizer, set_tokenizer
+
+CARDS_CSV = """ID,target,forbidden_1,forbidden_2,forbidden_3,forbidden_4,forbidden_5
+1,PERRO,Animal,Ladrar,Mascota,Hueso,Collar
+2,ÁRBOL,Hoja,Tronco,Rama,Bosque,Raíz
+3,CEPILLO DE DIENTES,Boca,Pasta,Limpiar,Baño,Cerdas
+"""
+
+@pytest.fixture(autouse=True)
+def isolated_store(monkeypatch):
+    # The compiled tokens and lemmas registered by the tests don't leak into other tests.
+    # The rule-based tokenizer compiles the cards without loading Spacy
+    monkeypatch.setattr(evaluate_hint, '_compiled_tokens', {})
+    monkeypatch.setattr(evaluate_guess, '_compiled_lemmas', {})
+    previous = get_tokenizer()
+    set_tokenizer('rules')
+    yield
+    set_tokenizer(previous)
+
+@pytest.fixture
+def cards_path(tmp_path):
+    path = tmp_path / 'cards.csv'
+    path.write_text(CARDS_CSV, encoding='utf-8')
+    return str(path)
+
+def assert_same_cards(store : CardStore, expected : CardStore):
+    assert list(store.ids) == list(expected.ids)
+    assert store.targets == expected.targets
+    assert store.forbidden == expected.forbidden
+
+def test_compiled_store_keeps_the_cards_tokens_and_lemmas(cards_path):
+    compiled = CardStore.compile(cards_path)
+    loaded = CardStore.load(cards_path)
+    assert_same_cards(loaded, CardStore.from_csv(cards_path))
+    assert loaded.tokens == compiled.tokens
+    assert loaded.lemmas == compiled.lemmas
+    assert evaluate_hint._compiled_tokens
+
+def test_store_is_not_written_in_place(cards_path, tmp_path):
+    CardStore.compile(cards_path)
+    assert sorted(os.listdir(tmp_path)) == ['cards.csv', 'cards.store']
+
+def test_missing_store_reads_the_csv(cards_path):
+    store = CardStore.load(cards_path)
+    assert store.tokens is None
+    assert len(store) == 3
+
+def test_stale_store_reads_the_csv(cards_path):
+    CardStore.compile(cards_path)
+    with open(cards_path, 'a', encoding='utf-8') as f:
+        f.write('4,GATO,Animal,Maullar,Felino,Bigotes,Ratón\n')
+    store = CardStore.load(cards_path)
+    assert store.tokens is None
+    assert len(store) == 4
+
+@pytest.mark.parametrize('corrupt', [lambda data : data[:len(data) // 2], lambda data : data.split(b'\n', 1)[0],
+                                     lambda data : b'', lambda data : b'\x80\x05garbage',
+                                     lambda data : b'{"version": 2}\n' + data.split(b'\n', 1)[1]])
+def test_broken_store_reads_the_csv(cards_path, corrupt):
+    CardStore.compile(cards_path)
+    store_path = CardStore.store_path(cards_path)
+    with open(store_path, 'rb') as f:
+        data = f.read()
+    with open(store_path, 'wb') as f:
+        f.write(corrupt(data))
+    store = CardStore.load(cards_path)
+    assert store.tokens is None
+    assert_same_cards(store, CardStore.from_csv(cards_path))
@@ -0,0 +1,48 @@
+import csv
+import os
+import pytest
+from src.evaluate_guess import GuessMatcher, singularize, split_guess
+from src.evaluate_hint import get_tokenizer, set_tokenizer
+
+CARDS_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'cards.csv')
+
+def load_targets() -> list:
+    with open(CARDS_PATH, encoding='utf-8', newline='') as f:
+        return [row['target'] for row in csv.DictReader(f)]
+
+@pytest.fixture(params=['rules', 'spacy'])
+def tokenizer(request):
+    if request.param == 'spacy':
+        pytest.importorskip('spacy')
+    previous = get_tokenizer()
+    set_tokenizer(request.param)
+    yield request.param
+    set_tokenizer(previous)
+
+@pytest.mark.parametrize('target, truncated', [('PAIS', 'pai'), ('TENIS', 'teni'), ('CACTUS', 'cactu'), ('VENUS', 'venu'),
+                                               ('PARIS', 'pari'), ('ANALISIS', 'analisi'), ('BIGOTES', 'bigot'),
+                                               ('ESTEROIDES', 'esteroid')])
+def test_truncated_target_is_not_a_hit(tokenizer, target, truncated):
+    assert GuessMatcher(target).evaluate(truncated) != 'ACIERTO'
+
+def test_no_truncated_target_of_the_deck_is_a_hit(tokenizer):
+    for target in load_targets():
+        words = split_guess(target)
+        truncated = ' '.join(singularize(word) for word in words)
+        if truncated != ' '.join(words):
+            assert GuessMatcher(target).evaluate(truncated) != 'ACIERTO', target
+
+@pytest.mark.parametrize('target, guess', [('PAIS', 'países'), ('PAIS', 'el país'), ('ZAPATO', 'zapatos'),
+                                           ('LUZ', 'luces'), ('BIGOTES', 'Bigotes')])
+def test_target_and_plural_are_hits(tokenizer, target, guess):
+    assert GuessMatcher(target).evaluate(guess) == 'ACIERTO'
+
+def test_synonyms_add_hits_without_rejecting_other_words(tokenizer):
+    matcher = GuessMatcher('GARAGE', ['Garaje'])
+    assert matcher.evaluate('garajes') == 'ACIERTO'
+    assert matcher.evaluate('cochera') is None
+
+def test_repeated_guess_uses_the_recorded_evaluation(tokenizer):
+    matcher = GuessMatcher('GARAGE')
+    matcher.record('Cochera', 'ACIERTO')
+    assert matcher.evaluate('la cochera') == 'ACIERTO'
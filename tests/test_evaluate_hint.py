@@ -0,0 +1,61 @@
+import itertools
+import random
+from functools import lru_cache
+import pytest
+from src.evaluate_hint import lev_dist, lev_within
+
+def recursive_lev_dist(a : str, b : str) -> int:
+    # The recursive implementation replaced by lev_dist
+    @lru_cache(None)
+    def min_dist(s1, s2):
+        if s1 == len(a) or s2 == len(b):
+            return len(a) - s1 + len(b) - s2
+        if a[s1] == b[s2]:
+            return min_dist(s1 + 1, s2 + 1)
+        return 1 + min(min_dist(s1, s2 + 1), min_dist(s1 + 1, s2), min_dist(s1 + 1, s2 + 1))
+    return min_dist(0, 0)
+
+def random_pairs(n : int, seed : int = 0) -> list:
+    rng = random.Random(seed)
+    pairs = []
+    for _ in range(n):
+        a = ''.join(rng.choice('abcn') for _ in range(rng.randrange(8)))
+        b = list(a)
+        # Small edits of a, so there are pairs at every distance around the cutoffs
+        for _ in range(rng.randrange(4)):
+            position = rng.randrange(len(b) + 1)
+            operation = rng.choice(('insert', 'delete', 'replace'))
+            if operation == 'insert':
+                b.insert(position, rng.choice('abcn'))
+            elif b and position < len(b):
+                if operation == 'delete':
+                    del b[position]
+                else:
+                    b[position] = rng.choice('abcn')
+        pairs.append((a, ''.join(b)))
+    return pairs
+
+EDGE_PAIRS = [('', ''), ('', 'a'), ('abc', ''), ('stamp', 'stomp'), ('casa', 'casas'), ('casas', 'casa'),
+              ('scasa', 'casa'), ('casa', 'acasa'), ('perro', 'perro'), ('perro', 'gato'), ('ab', 'ba'),
+              ('abc', 'abcde'), ('cdeab', 'ab'), ('abc', 'xbc'), ('abc', 'abx'), ('aaaa', 'aaa'), ('kitten', 'sitting')]
+PAIRS = EDGE_PAIRS + random_pairs(300)
+
+def test_lev_dist_matches_recursive_implementation():
+    for a, b in PAIRS:
+        assert lev_dist(a, b) == recursive_lev_dist(a, b), (a, b)
+
+@pytest.mark.parametrize('max_dist', [0, 1, 2, 3])
+def test_lev_dist_stops_above_max_dist(max_dist):
+    for a, b in PAIRS:
+        assert lev_dist(a, b, max_dist) == min(recursive_lev_dist(a, b), max_dist + 1), (a, b)
+
+@pytest.mark.parametrize('max_dist', [0, 1, 2])
+def test_lev_within_matches_recursive_implementation(max_dist):
+    for a, b in PAIRS:
+        assert lev_within(a, b, max_dist) == (recursive_lev_dist(a, b) <= max_dist), (a, b)
+
+def test_lev_within_all_short_strings():
+    # Every pair of strings up to 4 characters over a small alphabet, which covers all the prefix and suffix cases of distance 1
+    words = [''.join(chars) for n in range(5) for chars in itertools.product('ab', repeat=n)]
+    for a, b in itertools.product(words, repeat=2):
+        assert lev_within(a, b) == (recursive_lev_dist(a, b) <= 1), (a, b)
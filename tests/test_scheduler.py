@@ -0,0 +1,216 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from src import scheduler as scheduler_module
+from src.scheduler import BACKGROUND, INTERACTIVE, RequestScheduler, TokenBucket, set_priority
+
+class FakeClock():
+    """
+    Monotonic clock of the scheduler that only moves when the test advances it.
+    """
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(scheduler_module.time, 'monotonic', clock.monotonic)
+    return clock
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    # The backoff delays, recorded instead of waited
+    delays = []
+    real_sleep = asyncio.sleep
+    async def fake_sleep(delay, *args, **kwargs):
+        delays.append(delay)
+        await real_sleep(0)
+    monkeypatch.setattr(scheduler_module.asyncio, 'sleep', fake_sleep)
+    monkeypatch.setattr(scheduler_module.random, 'uniform', lambda a, b : 1.0)
+    return delays
+
+class RateLimitError(Exception):
+    status_code = 429
+
+async def settle() -> None:
+    # Lets the waiting tasks run until they block again
+    for _ in range(20):
+        await asyncio.sleep(0)
+
+async def advance(scheduler : RequestScheduler, clock : FakeClock, seconds : float) -> None:
+    # Moves the clock and wakes the requests waiting for the buckets
+    clock.now += seconds
+    async with scheduler._condition:
+        scheduler._condition.notify_all()
+    await settle()
+
+def test_token_bucket_refills_up_to_its_capacity(clock):
+    bucket = TokenBucket(60)
+    bucket.take(60)
+    assert bucket.wait_time(1) == pytest.approx(1.0)
+    clock.now += 0.5
+    assert bucket.wait_time(1) == pytest.approx(0.5)
+    clock.now += 1000
+    assert bucket.wait_time(60) == 0
+    bucket.take(60)
+    assert bucket.wait_time(1) == pytest.approx(1.0)
+
+def test_token_bucket_waits_for_a_full_bucket_above_its_capacity(clock):
+    bucket = TokenBucket(60)
+    bucket.take(30)
+    assert bucket.wait_time(1000) == pytest.approx(30.0)
+
+def test_token_bucket_without_limit_never_waits(clock):
+    bucket = TokenBucket(None)
+    bucket.take(10 ** 9)
+    assert bucket.wait_time(10 ** 9) == 0
+
+def test_interactive_requests_go_before_background_ones(clock):
+    async def run():
+        scheduler = RequestScheduler(requests_per_minute=60)
+        scheduler.requests.take(60)
+        order = []
+        async def request(name, priority):
+            set_priority(priority)
+            await scheduler.acquire(0)
+            order.append(name)
+        tasks = [asyncio.create_task(request('background 1', BACKGROUND)),
+                 asyncio.create_task(request('background 2', BACKGROUND))]
+        await settle()
+        tasks.append(asyncio.create_task(request('interactive', INTERACTIVE)))
+        await settle()
+        assert order == []
+        for _ in range(3):
+            await advance(scheduler, clock, 1.0)
+        await asyncio.gather(*tasks)
+        return order
+    assert asyncio.run(run()) == ['interactive', 'background 1', 'background 2']
+
+def test_waiting_request_is_promoted_when_its_priority_changes(clock):
+    async def run():
+        scheduler = RequestScheduler(requests_per_minute=60)
+        scheduler.requests.take(60)
+        order = []
+        promoted = False
+        async def request(name, priority):
+            set_priority(priority)
+            await scheduler.acquire(0)
+            order.append(name)
+        tasks = [asyncio.create_task(request('background', BACKGROUND)),
+                 asyncio.create_task(request('prepared card', lambda : INTERACTIVE if promoted else BACKGROUND))]
+        await settle()
+        promoted = True
+        for _ in range(2):
+            await advance(scheduler, clock, 1.0)
+        await asyncio.gather(*tasks)
+        return order
+    assert asyncio.run(run()) == ['prepared card', 'background']
+
+def test_rate_limited_requests_are_retried_with_exponential_backoff(sleeps):
+    async def run():
+        scheduler = RequestScheduler(max_retries=3, base_delay=1.0)
+        attempts = []
+        async def request():
+            attempts.append(1)
+            if len(attempts) <= 2:
+                raise RateLimitError('429')
+            return SimpleNamespace(content='OK', usage=None)
+        return scheduler, await scheduler.send(request, 0), len(attempts)
+    scheduler, result, attempts = asyncio.run(run())
+    assert result.content == 'OK'
+    assert attempts == 3
+    assert sleeps == [1.0, 2.0]
+    assert (scheduler.sent, scheduler.retries) == (3, 2)
+
+def test_rate_limited_request_fails_after_max_retries(sleeps):
+    async def request():
+        raise RateLimitError('429')
+    with pytest.raises(RateLimitError):
+        asyncio.run(RequestScheduler(max_retries=2).send(request, 0))
+    assert len(sleeps) == 2
+
+def test_other_errors_are_not_retried(sleeps):
+    async def request():
+        raise ValueError('bad request')
+    scheduler = RequestScheduler(max_retries=3)
+    with pytest.raises(ValueError):
+        asyncio.run(scheduler.send(request, 0))
+    assert scheduler.sent == 1
+    assert sleeps == []
+
+class TestScheduledClient():
+    @pytest.fixture(autouse=True)
+    def requires_autogen(self):
+        pytest.importorskip('autogen_core')
+
+    @staticmethod
+    def build_client(scheduler : RequestScheduler = None, coalesce : bool = True, **mock_options):
+        from src.client_wrappers import ScheduledChatCompletionClient
+        from src.mock_client import MockChatCompletionClient
+        mock = MockChatCompletionClient(responses=['OK'], seed=0, **mock_options)
+        return mock, ScheduledChatCompletionClient(mock, scheduler or RequestScheduler(), 'mock', coalesce=coalesce)
+
+    @staticmethod
+    def messages(text : str = 'Evalúa la respuesta.') -> list:
+        from autogen_core.models import UserMessage
+        return [UserMessage(content=text, source='user')]
+
+    def test_identical_requests_in_flight_share_the_response(self):
+        mock, client = self.build_client(latency=0.05)
+        async def run():
+            return await asyncio.gather(client.create(self.messages()), client.create(self.messages()),
+                                        client.create(self.messages('Otra respuesta.')))
+        first, shared, other = asyncio.run(run())
+        assert mock.calls == 2
+        assert client.scheduler.coalesced == 1
+        assert first.content == shared.content == other.content == 'OK'
+        assert first.usage.prompt_tokens > 0
+        assert (shared.usage.prompt_tokens, shared.usage.completion_tokens) == (0, 0)
+
+    def test_requests_are_not_coalesced_without_coalesce(self):
+        mock, client = self.build_client(coalesce=False, latency=0.05)
+        async def run():
+            return await asyncio.gather(client.create(self.messages()), client.create(self.messages()))
+        asyncio.run(run())
+        assert mock.calls == 2
+        assert client.scheduler.coalesced == 0
+
+    def test_cancelled_caller_doesnt_cancel_the_shared_request(self):
+        from autogen_core import CancellationToken
+        mock, client = self.build_client(latency=0.1)
+        async def run():
+            token = CancellationToken()
+            cancelled = asyncio.create_task(client.create(self.messages(), cancellation_token=token))
+            waiting = asyncio.create_task(client.create(self.messages(), cancellation_token=CancellationToken()))
+            await asyncio.sleep(0.01)
+            token.cancel()
+            return await asyncio.gather(cancelled, waiting, return_exceptions=True)
+        cancelled, waiting = asyncio.run(run())
+        assert isinstance(cancelled, asyncio.CancelledError)
+        assert waiting.content == 'OK'
+        assert mock.calls == 1
+
+    def test_shared_request_is_cancelled_without_callers(self):
+        from autogen_core import CancellationToken
+        mock, client = self.build_client(latency=0.1)
+        async def run():
+            token = CancellationToken()
+            task = asyncio.create_task(client.create(self.messages(), cancellation_token=token))
+            await asyncio.sleep(0.01)
+            token.cancel()
+            result = await asyncio.gather(task, return_exceptions=True)
+            await settle()
+            return result[0]
+        assert isinstance(asyncio.run(run()), asyncio.CancelledError)
+        assert client.scheduler._in_flight == {}
+
+    def test_tokens_are_only_counted_with_a_tokens_limit(self, monkeypatch):
+        counted = []
+        for tokens_per_minute in (None, 1000):
+            mock, client = self.build_client(RequestScheduler(tokens_per_minute=tokens_per_minute))
+            monkeypatch.setattr(mock, 'count_tokens', lambda messages, tools=[] : counted.append(tokens_per_minute) or 3)
+            asyncio.run(client.create(self.messages()))
+        assert counted == [1000]